@@ -0,0 +1,111 @@
+"""
+Нагрузка медленными клиентами: сравнение WSGI и ASGI.
+
+Часть клиентов отправляет запрос по байту с паузами, как мобильный
+клиент на плохой сети, и занимает соединение на --slow секунд.
+Одновременно быстрые клиенты запрашивают ту же страницу; по их
+задержкам и числу ответов в секунду видно, сколько запросов сервер
+обслуживает параллельно.
+
+    python benchmarks/concurrency.py http://127.0.0.1:8000/ --slow-clients 100
+
+Только стандартная библиотека, запуск вне Django.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def build_request(url):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return (
+        'GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n'.format(path, parts.netloc)
+    ).encode()
+
+
+async def fetch(url, drip=0.0):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    request = build_request(url)
+    if drip:
+        # медленный клиент: запрос уходит по байту
+        for i in range(len(request)):
+            writer.write(request[i:i + 1])
+            await writer.drain()
+            await asyncio.sleep(drip)
+    else:
+        writer.write(request)
+        await writer.drain()
+    status = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status.split()[1])
+
+
+async def slow_client(url, seconds, stop):
+    drip = seconds / len(build_request(url))
+    while not stop.is_set():
+        try:
+            await fetch(url, drip)
+        except OSError:
+            await asyncio.sleep(0.1)
+
+
+async def fast_client(url, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            status = await fetch(url)
+        except OSError:
+            errors.append('connection')
+            continue
+        if status != 200:
+            errors.append(status)
+        latencies.append(time.monotonic() - started)
+
+
+async def main(options):
+    stop = asyncio.Event()
+    slow = [
+        asyncio.ensure_future(slow_client(options.url, options.slow, stop))
+        for _ in range(options.slow_clients)
+    ]
+    # медленные клиенты успевают занять соединения
+    await asyncio.sleep(1)
+
+    latencies, errors = [], []
+    deadline = time.monotonic() + options.duration
+    await asyncio.gather(*[
+        fast_client(options.url, deadline, latencies, errors)
+        for _ in range(options.clients)
+    ])
+    stop.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    if not latencies:
+        print('Нет ни одного ответа, ошибок: {}'.format(len(errors)))
+        return
+    latencies.sort()
+    print('ответов: {}, в секунду: {:.1f}, ошибок: {}'.format(
+        len(latencies), len(latencies) / options.duration, len(errors)))
+    print('задержка p50: {:.0f} мс, p95: {:.0f} мс, max: {:.0f} мс'.format(
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        latencies[-1] * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('url')
+    parser.add_argument('--clients', type=int, default=20, help='быстрых клиентов')
+    parser.add_argument('--slow-clients', type=int, default=50, help='медленных клиентов')
+    parser.add_argument('--slow', type=float, default=5.0, help='секунд на один медленный запрос')
+    parser.add_argument('--duration', type=float, default=15.0, help='секунд замера')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+Конкурентные чтение и запись в SQLite: настройки по умолчанию против
+профиля yatube.settings_production.
+
+Писатели добавляют комментарии (со всеми сигналами: счётчики, сброс
+кэшей), читатели в это время листают ленту. Каждый профиль гоняется на
+свежей копии базы во временном каталоге. В профиле по умолчанию
+соединение закрывается после каждой операции, как после запроса при
+CONN_MAX_AGE = 0, в продакшен-профиле - переиспользуется.
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 4 --duration 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, close_old_connections, connection  # noqa: E402
+
+from posts.models import Comment, Post, User  # noqa: E402
+from yatube import settings_production  # noqa: E402
+
+PROFILES = {
+    'default': {'CONN_MAX_AGE': 0, 'SQLITE_PRAGMAS': {}},
+    'production': {
+        # потоки бенчмарка живут, как потоки WSGI-сервера
+        'CONN_MAX_AGE': settings_production.WSGI_CONN_MAX_AGE,
+        'SQLITE_PRAGMAS': settings_production.SQLITE_PRAGMAS,
+    },
+}
+
+
+def prepare(path, profile, posts):
+    # словарь настроек общий для всех потоков: новые соединения
+    # открываются уже с ними
+    connection.close()
+    settings.DATABASES['default'].update(NAME=path, CONN_MAX_AGE=profile['CONN_MAX_AGE'])
+    settings.SQLITE_PRAGMAS = profile['SQLITE_PRAGMAS']
+    call_command('migrate', verbosity=0)
+    author = User.objects.create_user('bench_author')
+    Post.objects.bulk_create(
+        Post(author=author, text='Пост {}'.format(i)) for i in range(posts))
+    return author
+
+
+def worker(operation, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            operation()
+        except OperationalError as error:
+            errors.append(str(error))
+        else:
+            latencies.append(time.monotonic() - started)
+        # конец "запроса": при CONN_MAX_AGE = 0 соединение закрывается
+        close_old_connections()
+    connection.close()
+
+
+def run(name, options):
+    profile = PROFILES[name]
+    with tempfile.TemporaryDirectory() as directory:
+        author = prepare(os.path.join(directory, 'bench.sqlite3'), profile, options.posts)
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        connection.close()
+
+        def read():
+            list(Post.objects.select_related('author', 'group').order_by('-pub_date')[:10])
+
+        def write():
+            Comment.objects.create(
+                post_id=post_ids[int(time.monotonic() * 1000) % len(post_ids)],
+                author=author, text='Комментарий')
+
+        results = {'read': ([], []), 'write': ([], [])}
+        deadline = time.monotonic() + options.duration
+        threads = [
+            threading.Thread(target=worker, args=(read, deadline) + results['read'])
+            for _ in range(options.readers)
+        ] + [
+            threading.Thread(target=worker, args=(write, deadline) + results['write'])
+            for _ in range(options.writers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    print('{}:'.format(name))
+    for kind, (latencies, errors) in results.items():
+        if not latencies:
+            print('  {}: нет успешных операций, ошибок: {}'.format(kind, len(errors)))
+            continue
+        latencies.sort()
+        print('  {}: {:.0f} оп/с, p50 {:.1f} мс, p95 {:.1f} мс, ошибок: {}'.format(
+            kind, len(latencies) / options.duration,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            len(errors)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=8, help='потоков чтения')
+    parser.add_argument('--writers', type=int, default=4, help='потоков записи')
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд на профиль')
+    parser.add_argument('--posts', type=int, default=1000, help='постов в базе')
+    parser.add_argument('--profile', choices=sorted(PROFILES), action='append',
+                        help='какие профили гонять (по умолчанию все)')
+    options = parser.parse_args()
+    settings.DEBUG = False
+    for name in options.profile or ['default', 'production']:
+        run(name, options)
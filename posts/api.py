@@ -0,0 +1,82 @@
+"""
+JSON API лент только для чтения: те же выборки, что у страниц index,
+group_posts и profile (posts.services.post_request), с курсорной
+пагинацией. Неизменившаяся лента отвечает 304 по ETag/Last-Modified,
+не загружая постов.
+"""
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Group, User
+from .services import freshness, post_request, replicas
+from .services.counters import get_stats
+from .services.paginator import CursorPaginator
+
+# компактный JSON: без пробелов и \u-экранирования кириллицы
+JSON_OPTIONS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        limit = settings.API_PAGE_SIZE
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def serialize_page(request, post_list):
+    paginator = CursorPaginator(post_list, get_limit(request))
+    page = paginator.get_page(request.GET.get('cursor'), request.GET.get('dir'))
+    return {
+        'posts': [serialize_post(post) for post in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def json_response(data):
+    return JsonResponse(data, json_dumps_params=JSON_OPTIONS)
+
+
+@replicas.read_only
+@freshness.conditional(freshness.feed_state)
+def index(request):
+    return json_response(serialize_page(request, post_request.latest_posts()))
+
+
+@replicas.read_only
+@freshness.conditional(freshness.group_state)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    data = serialize_page(request, post_request.group_posts(group))
+    data['group'] = {'slug': group.slug, 'title': group.title, 'description': group.description}
+    return json_response(data)
+
+
+@replicas.read_only
+@freshness.conditional(freshness.author_state)
+def profile(request, username):
+    user = get_object_or_404(User.objects.select_related('stats'), username=username)
+    data = serialize_page(request, post_request.author_posts(user))
+    stats = get_stats(user)
+    data['profile'] = {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    }
+    return json_response(data)
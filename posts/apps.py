@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
 #    verbose_name = 'Статьи'
+
+    def ready(self):
+        from . import signals, tasks
+        post_migrate.connect(signals.install_search_index, sender=self)
@@ -0,0 +1,40 @@
+"""
+Асинхронные версии страниц ленты для запуска под ASGI (yatube/asgi.py).
+
+Запрос к базе и рендеринг шаблона остаются синхронными и выполняются
+в пуле потоков posts.services.blocking, поэтому медленный клиент
+держит только корутину, а не поток воркера. Логика страниц общая
+с posts.views.
+"""
+import functools
+
+import django
+
+from . import views
+from .services import blocking, export
+
+
+def run_in_pool(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await blocking.run(view, request, *args, **kwargs)
+    return wrapper
+
+
+index = run_in_pool(views.index)
+group_posts = run_in_pool(views.group_posts)
+profile = run_in_pool(views.profile)
+post_view = run_in_pool(views.post_view)
+post_comments = run_in_pool(views.post_comments)
+follow_index = run_in_pool(views.follow_index)
+
+
+if django.VERSION >= (4, 2):
+    async def export_posts(request, username):
+        # Django 4.2 отдаёт асинхронный итератор без буферизации
+        return await blocking.run(
+            views.export_response, request, username, export.Export.achunks)
+else:
+    # раньше ASGI перебирал потоковый ответ синхронно в цикле событий:
+    # выгрузку отдаёт WSGI-версия страницы (yatube.asgi.WsgiExports)
+    export_posts = views.export_posts
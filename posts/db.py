@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+def apply_pragmas(connection, pragmas=None):
+    """
+    Выполняет PRAGMA из SQLITE_PRAGMAS на соединении с SQLite. Почти все
+    они действуют только на это соединение, поэтому вызываются при каждом
+    подключении; journal_mode=WAL сохраняется в файле базы.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = settings.SQLITE_PRAGMAS if pragmas is None else pragmas
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
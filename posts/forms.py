@@ -1,5 +1,7 @@
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
 from django.forms import ModelForm
 from .models import Post, Comment
+from .services import images
 from django import forms
 
 
@@ -8,6 +10,20 @@ class PostForm(ModelForm):
         model = Post
         fields = ('group', 'text', 'image',)
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # при редактировании без новой загрузки здесь уже сохранённый файл
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            result = images.ingest(image)
+        except images.ImageRejected as error:
+            raise forms.ValidationError(str(error))
+        if result is None:
+            return image
+        content, name = result
+        return SimpleUploadedFile(name, content)
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,48 @@
+import gzip
+import io
+import sys
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from posts.services import bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Загружает пользователей, группы, посты и подписки из NDJSON пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл NDJSON (можно .gz), "-" - stdin')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-sync', action='store_true',
+                            help='не пересчитывать счётчики, ленты и кэши после загрузки')
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8')
+
+    def handle(self, *args, **options):
+        importer = bulk_import.Importer(options['batch_size'])
+        errors = Counter()
+        started = time.monotonic()
+
+        def progress(counts):
+            self.stderr.write('постов: {}, {:.0f} строк/с'.format(
+                counts['post'], bulk_import.rate(sum(counts.values()), started)))
+
+        with self.open(options['path']) as lines:
+            counts = importer.run(bulk_import.read_ndjson(lines, errors), progress)
+        total = sum(counts.values()) - counts['skipped']
+        self.stdout.write('Загружено: {} пользователей, {} групп, {} постов, {} подписок'.format(
+            counts['user'], counts['group'], counts['post'], counts['follow']))
+        self.stdout.write('Пропущено: {}, нечитаемых строк: {}'.format(
+            counts['skipped'], errors['invalid']))
+        self.stdout.write('{:.0f} строк/с'.format(bulk_import.rate(total, started)))
+
+        if not options['no_sync']:
+            importer.sync()
+            self.stdout.write('Счётчики, ленты и кэши обновлены')
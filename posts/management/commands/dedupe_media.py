@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.models import MediaBlob, Post
+from posts.services import media, thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в хранилище по содержимому и убирает дубликаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='удалить файлы в posts/, на которые не ссылается ни один пост')
+
+    def handle(self, *args, **options):
+        storage = media.get_storage()
+        names = set(Post.objects.exclude(image='').exclude(
+            image__isnull=True).values_list('image', flat=True))
+        migrated = 0
+        for name in sorted(names):
+            if not storage.exists(name):
+                self.stderr.write('Нет файла: {}'.format(name))
+                continue
+            new_name = media.migrate_file(name)
+            if new_name != name:
+                thumbnails.refresh_pages(new_name)
+                migrated += 1
+
+        fixed = media.reconcile_refcounts()
+        for name in MediaBlob.objects.filter(refcount=0).values_list('name', flat=True):
+            media.collect(name)
+        self.stdout.write('Перенесено файлов: {}, исправлено счётчиков: {}'.format(migrated, fixed))
+
+        if options['delete_orphans']:
+            referenced = set(MediaBlob.objects.values_list('name', flat=True))
+            orphans = [name for name in self.walk(storage, 'posts') if name not in referenced]
+            for name in orphans:
+                storage.delete(name)
+            self.stdout.write('Удалено файлов без постов: {}'.format(len(orphans)))
+
+    def walk(self, storage, path):
+        if not storage.exists(path):
+            return
+        directories, files = storage.listdir(path)
+        for name in files:
+            yield os.path.join(path, name)
+        for directory in directories:
+            yield from self.walk(storage, os.path.join(path, directory))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import ImageVariant, Post
+from posts.services import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Нарезает превью для картинок постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='перерезать и картинки, у которых превью уже есть')
+
+    def handle(self, *args, **options):
+        sources = set(Post.objects.exclude(image='').exclude(
+            image__isnull=True).values_list('image', flat=True))
+        if not options['all']:
+            sources -= set(ImageVariant.objects.values_list('source', flat=True))
+        done = 0
+        for source in sorted(sources):
+            try:
+                thumbnails.generate(source)
+            except Exception as error:
+                self.stderr.write('{}: {}'.format(source, error))
+                continue
+            thumbnails.refresh_pages(source)
+            done += 1
+        self.stdout.write('Нарезано картинок: {} из {}'.format(done, len(sources)))
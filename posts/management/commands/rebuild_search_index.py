@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.services import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        indexed = search.rebuild_index(options['batch_size'])
+        if not search.is_available():
+            self.stderr.write('FTS5 недоступен, поиск работает без индекса')
+            return
+        self.stdout.write('Проиндексировано постов: {} за {:.1f} с'.format(
+            indexed, time.monotonic() - started))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.services import counters, media
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики, если они разошлись с данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile_comment_counts(options['batch_size'])
+        self.stdout.write('Исправлено счётчиков комментариев: {}'.format(fixed))
+        fixed = counters.reconcile_user_stats(options['batch_size'])
+        self.stdout.write('Исправлено профилей: {}'.format(fixed))
+        fixed = media.reconcile_refcounts()
+        self.stdout.write('Исправлено счётчиков ссылок на файлы: {}'.format(fixed))
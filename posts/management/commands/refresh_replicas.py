@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts.services import replicas
+
+
+class Command(BaseCommand):
+    help = 'Обновляет SQLite-реплики копией основной базы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float,
+                            default=settings.DATABASE_REPLICA_REFRESH_INTERVAL,
+                            help='повторять каждые N секунд (по умолчанию '
+                                 'DATABASE_REPLICA_REFRESH_INTERVAL), 0 - один раз')
+
+    def handle(self, *args, **options):
+        for alias in [*settings.DATABASE_REPLICAS, 'default']:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('Копией обновляются только реплики SQLite')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                replicas.refresh(alias)
+                self.stdout.write('Реплика {} обновлена за {:.2f} с'.format(
+                    alias, time.monotonic() - started))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
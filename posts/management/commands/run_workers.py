@@ -0,0 +1,71 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def stop_on_signal():
+    # SIGTERM дожидается конца текущей задачи, а не обрывает её
+    stopping = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *args: stopping.append(True))
+    return lambda: bool(stopping)
+
+
+def worker_process(poll):
+    import django
+    django.setup()
+    from posts.services import jobs
+    jobs.work(stop_on_signal(), poll=poll)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOBS_WORKERS)
+        parser.add_argument('--poll', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='пауза между опросами пустой очереди, секунды')
+        parser.add_argument('--once', action='store_true',
+                            help='выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        from posts.services import jobs
+
+        purged = jobs.purge_finished(settings.JOBS_KEEP_DAYS)
+        if purged:
+            self.stdout.write('Удалено выполненных задач: {}'.format(purged))
+
+        if options['once']:
+            done = jobs.work(until_empty=True, poll=options['poll'])
+            self.stdout.write('Выполнено задач: {}'.format(done))
+            return
+        if options['processes'] <= 1:
+            jobs.work(stop_on_signal(), poll=options['poll'])
+            return
+
+        # spawn: дочерний процесс не наследует соединения с базой родителя
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=worker_process, args=(options['poll'],), daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write('Запущено воркеров: {}'.format(len(workers)))
+
+        stop = stop_on_signal()
+        while not stop():
+            for i, worker in enumerate(workers):
+                if not worker.is_alive():
+                    # упавший воркер заменяем, его задачу вернёт requeue_stale
+                    workers[i] = context.Process(
+                        target=worker_process, args=(options['poll'],), daemon=True)
+                    workers[i].start()
+            time.sleep(1)
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
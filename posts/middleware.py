@@ -0,0 +1,99 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.deprecation import MiddlewareMixin
+
+from .services import blocking, page_cache, replicas
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Полностраничный кэш для анонимных GET-запросов.
+
+    Стоит выше SessionMiddleware и CsrfViewMiddleware: запрос без cookie
+    сессии отдаётся из кэша без сессии, CSRF и обращений к базе.
+    Кэшируются только страницы, помеченные page_cache.tag(), и
+    сбрасываются они по этим ключам из сигналов posts.signals.
+    Под ASGI работает асинхронно: обращения к кэшу уходят в пул потоков.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        key = page_cache.page_key(request)
+        response = page_cache.fetch(key)
+        if response is not None:
+            return self.conditional(request, response)
+
+        started = page_cache.clock()
+        response = self.get_response(request)
+        tags = getattr(request, 'surrogate_keys', None)
+        if tags and self.is_cacheable_response(request, response):
+            page_cache.store(key, response, tags, started, self.get_timeout(request))
+        return response
+
+    async def __acall__(self, request):
+        if not self.is_cacheable_request(request):
+            return await self.get_response(request)
+
+        key = page_cache.page_key(request)
+        response = await blocking.run(page_cache.fetch, key)
+        if response is not None:
+            return self.conditional(request, response)
+
+        started = await blocking.run(page_cache.clock)
+        response = await self.get_response(request)
+        tags = getattr(request, 'surrogate_keys', None)
+        if tags and self.is_cacheable_response(request, response):
+            await blocking.run(
+                page_cache.store, key, response, tags, started, self.get_timeout(request))
+        return response
+
+    def conditional(self, request, response):
+        # закэшированная страница хранит свои ETag/Last-Modified - 304 без рендеринга
+        return get_conditional_response(
+            request, etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+            response=response)
+
+    def is_cacheable_request(self, request):
+        return (request.method == 'GET'
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+    def get_timeout(self, request):
+        # страница из реплики могла отстать от сброса кэша при записи
+        if getattr(request, 'replica', None):
+            return settings.DATABASE_REPLICA_MAX_LAG
+        return None
+
+    def is_cacheable_response(self, request, response):
+        return (response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED'))
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """
+    После успешной записи ставит cookie, по которой страницы
+    replicas.read_only DATABASE_PIN_SECONDS секунд читают из основной
+    базы, а не из реплики, которая ещё не получила изменения.
+    """
+
+    def process_response(self, request, response):
+        if replicas.has_written(request) and response.status_code < 400:
+            response.set_cookie(
+                settings.DATABASE_PIN_COOKIE, '1', max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
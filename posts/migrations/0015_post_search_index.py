@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from posts.services import search
+    search.rebuild_index(using=schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from posts.services import search
+    search.drop_index(using=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_userstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_refcounts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    counts = Post.objects.exclude(image='').exclude(image__isnull=True).values(
+        'image').annotate(count=Count('id'))
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=row['image'], refcount=row['count']) for row in counts])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.RunPython(fill_refcounts, migrations.RunPython.noop),
+    ]
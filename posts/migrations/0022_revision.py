@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_job_queued_key_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('tag', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('changed', models.DateTimeField()),
+            ],
+        ),
+    ]
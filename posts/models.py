@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -25,7 +28,10 @@ class Post(models.Model):
         User, on_delete=models.CASCADE, related_name='author_posts')
     group = models.ForeignKey(Group, on_delete=models.CASCADE,
                               blank=True, null=True, related_name='group_posts')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=ContentAddressedStorage())
+    # поддерживается сигналами Comment, сверяется командой reconcile_counters
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.text
@@ -36,6 +42,12 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
+        # ленты группы и автора: (поле, pub_date) плюс неявный rowid в конце
+        # индекса, обратный проход даёт порядок -pub_date, -id без сортировки
+        indexes = [
+            models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+            models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -49,6 +61,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return 'Comment {} by {}'.format(self.text, self.author.get_full_name())
@@ -69,5 +84,140 @@ class Follow(models.Model):
         return f'{self.user} follows {self.author}'
 
 
+class UserStats(models.Model):
+    """
+    Счётчики профиля, которые показываются в боковой панели, и число
+    непрочитанных постов из подписок. Поддерживаются сигналами Post и
+    Follow и задачами уведомлений, доступны как user.stats.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+    # новые посты авторов из подписок, сбрасывается на странице /follow/
+    unread_posts = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Stats of {self.user_id}'
+
+
 User.add_to_class('tracking', models.ManyToManyField('self', through=Follow,
                                                      related_name='followers', symmetrical=False))
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента подписок: строка на каждый пост автора,
+    на которого подписан пользователь. Дата поста продублирована,
+    чтобы лента читалась одним проходом по индексу.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='timeline')
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} in timeline of {self.user_id}'
+
+
+class ImageVariant(models.Model):
+    """
+    Заранее посчитанная копия картинки поста нужной ширины и формата.
+    Привязана к имени исходного файла, а не к посту: шаблоны строят
+    srcset из этих строк и ничего не масштабируют во время запроса.
+    """
+    source = models.CharField(max_length=255, db_index=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        unique_together = ['source', 'width', 'format']
+
+    def __str__(self):
+        return f'{self.source} {self.width}w {self.format}'
+
+
+class MediaBlob(models.Model):
+    """
+    Счётчик ссылок постов на файл картинки. Файл общий для всех постов
+    с одинаковым содержимым и удаляется, когда ссылок не осталось.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} x{self.refcount}'
+
+
+class Job(models.Model):
+    """
+    Задача фоновой очереди (posts.services.jobs). Выполняется командой
+    run_workers; пока задача ждёт в очереди, её ключ key уникален.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.TextField(default='{}')
+    # больше - раньше
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    key = models.CharField(max_length=255, blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status='queued'),
+                name='job_queued_key_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class Revision(models.Model):
+    """
+    Время последнего изменения страниц с суррогатным ключом tag
+    ('post:1', 'author:5', ...), см. posts.services.page_cache.purge.
+    Хранится в базе, а не в кэше: его видят все процессы, а реплика
+    отдаёт его вместе с данными, на которых построена страница.
+    """
+    tag = models.CharField(max_length=100, primary_key=True)
+    changed = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.tag} @ {self.changed}'
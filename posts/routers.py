@@ -0,0 +1,32 @@
+from django.conf import settings
+
+from .services import replicas
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись и миграции - только в основную базу. Чтения уходят в реплику,
+    если страница выбрала её (posts.services.replicas.read_only), иначе
+    тоже в основную базу. Сессии всегда читаются из основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        # сессии - только из основной базы: реплика может не знать о входе
+        if model._meta.app_label == 'sessions':
+            return None
+        return replicas.current()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика - копия основной базы, связи между ними допустимы
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,126 @@
+import bisect
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from posts.models import Group, User
+
+# номер версии общий для всех процессов, пока общий кэш default (в
+# продакшене - memcached, см. settings_production): каждый процесс держит
+# свой индекс в памяти и перестраивает его, когда версия в кэше поменялась.
+# Версия меняется после коммита - иначе другой процесс мог бы перечитать
+# базу до него и запомнить новую версию без новой записи
+VERSION_KEY = 'autocomplete:version'
+
+
+class PrefixIndex:
+    """
+    Отсортированный список (ключ, значение) с поиском по префиксу
+    через bisect: O(log n) на поиск и вставку без обращений к базе.
+    """
+
+    def __init__(self, items=()):
+        self.items = sorted(items)
+
+    def add(self, key, value):
+        item = (key, value)
+        position = bisect.bisect_left(self.items, item)
+        if position == len(self.items) or self.items[position] != item:
+            self.items.insert(position, item)
+
+    def find(self, prefix, limit=10):
+        result = []
+        position = bisect.bisect_left(self.items, (prefix,))
+        while position < len(self.items) and len(result) < limit:
+            key, value = self.items[position]
+            if not key.startswith(prefix):
+                break
+            if value not in result:
+                result.append(value)
+            position += 1
+        return result
+
+
+class Autocomplete:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.users = PrefixIndex()
+        self.groups = PrefixIndex()
+
+    def load(self, version):
+        self.users = PrefixIndex(
+            (username.lower(), username)
+            for username in User.objects.filter(is_active=True).values_list('username', flat=True))
+        groups = []
+        for slug, title in Group.objects.values_list('slug', 'title'):
+            groups.append((slug.lower(), (slug, title)))
+            groups.append((title.lower(), (slug, title)))
+        self.groups = PrefixIndex(groups)
+        self.version = version
+
+    def ensure_loaded(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # после вытеснения ключа не начинаем с уже виденных номеров
+            cache.add(VERSION_KEY, int(time.time() * 1000), None)
+            version = cache.get(VERSION_KEY)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.load(version)
+
+    def find(self, query, limit=10):
+        self.ensure_loaded()
+        prefix = query.strip().lower()
+        if not prefix:
+            return {'users': [], 'groups': []}
+        return {
+            'users': self.users.find(prefix, limit),
+            'groups': [
+                {'slug': slug, 'title': title}
+                for slug, title in self.groups.find(prefix, limit)
+            ],
+        }
+
+    def add_user(self, username):
+        transaction.on_commit(lambda: self._add_user(username))
+
+    def add_group(self, slug, title):
+        transaction.on_commit(lambda: self._add_group(slug, title))
+
+    def invalidate(self):
+        # изменение или удаление: все процессы перечитают индекс из базы
+        transaction.on_commit(self._invalidate)
+
+    def _add_user(self, username):
+        with self.lock:
+            self.users.add(username.lower(), username)
+        self._bump_version()
+
+    def _add_group(self, slug, title):
+        with self.lock:
+            self.groups.add(slug.lower(), (slug, title))
+            self.groups.add(title.lower(), (slug, title))
+        self._bump_version()
+
+    def _invalidate(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            pass
+
+    def _bump_version(self):
+        # свой процесс уже обновлён на месте, остальные перечитают базу
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            return
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+
+
+index = Autocomplete()
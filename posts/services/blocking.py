@@ -0,0 +1,36 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_POOL_WORKERS, thread_name_prefix='orm')
+    return _executor
+
+
+def _call(func, *args, **kwargs):
+    # у каждого потока пула своё соединение: закрываем его по тем же
+    # правилам (CONN_MAX_AGE), что и обработчик запроса
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию (ORM, рендеринг, кэш) в ограниченном
+    пуле потоков ASYNC_POOL_WORKERS, не занимая цикл событий.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(_call, func, *args, **kwargs))
@@ -0,0 +1,197 @@
+import datetime
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.models import Follow, Group, Post, User
+from . import autocomplete, counters, feed_cache, page_cache, timeline
+
+# порядок сброса пачек: сначала то, на что ссылаются остальные
+KINDS = ('user', 'group', 'post', 'follow')
+BACKFILL_AUTHORS = 500
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """
+    bulk_create заполняет поля auto_now_add текущим временем поверх
+    переданных значений; на время загрузки даты берём из файла.
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def parse_date(value):
+    """
+    Дата из файла; без даты - текущее время. ValueError для
+    несуществующей даты вроде 2020-13-40T00:00 - строка пропускается.
+    """
+    date = parse_datetime(value) if value else None
+    if date is None:
+        return timezone.now()
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, datetime.timezone.utc)
+    return date
+
+
+class Importer:
+    """
+    Загрузка пользователей, групп, постов и подписок пачками через
+    bulk_create. Ники и слаги переводятся в id по словарям в памяти,
+    сигналы моделей не вызываются - производные данные (UserStats,
+    ленты подписок, кэши) досчитывает sync().
+    """
+
+    def __init__(self, batch_size=5000):
+        self.batch_size = batch_size
+        self.users = dict(User.objects.values_list('username', 'id').iterator())
+        self.groups = dict(Group.objects.values_list('slug', 'id').iterator())
+        self.pending = {kind: [] for kind in KINDS}
+        self.counts = Counter()
+        self.authors = set()
+        self.touched_groups = set()
+
+    def add(self, record):
+        kind = record.get('type')
+        if kind not in self.pending:
+            self.counts['skipped'] += 1
+            return
+        try:
+            obj = getattr(self, 'build_' + kind)(record)
+        except ValueError:
+            obj = None
+        if obj is None:
+            self.counts['skipped'] += 1
+            return
+        self.pending[kind].append(obj)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+
+    def resolve(self, kind, mapping, key):
+        # ссылка на запись из ещё не сброшенной пачки - сначала сбрасываем её
+        if key not in mapping and self.pending[kind]:
+            self.flush(kind)
+        return mapping.get(key)
+
+    def build_user(self, record):
+        if not record.get('username') or record['username'] in self.users:
+            return None
+        return User(
+            username=record['username'], email=record.get('email', ''),
+            first_name=record.get('first_name', ''), last_name=record.get('last_name', ''),
+            password=make_password(None))
+
+    def build_group(self, record):
+        if not record.get('slug') or record['slug'] in self.groups:
+            return None
+        return Group(slug=record['slug'], title=record.get('title') or record['slug'],
+                     description=record.get('description', ''))
+
+    def build_post(self, record):
+        author_id = self.resolve('user', self.users, record.get('author'))
+        group_id = None
+        if record.get('group'):
+            group_id = self.resolve('group', self.groups, record['group'])
+            if group_id is None:
+                return None
+        if author_id is None or not record.get('text'):
+            return None
+        self.authors.add(author_id)
+        if group_id:
+            self.touched_groups.add(group_id)
+        return Post(author_id=author_id, group_id=group_id, text=record['text'],
+                    pub_date=parse_date(record.get('pub_date')))
+
+    def build_follow(self, record):
+        user_id = self.resolve('user', self.users, record.get('user'))
+        author_id = self.resolve('user', self.users, record.get('author'))
+        if user_id is None or author_id is None or user_id == author_id:
+            return None
+        self.authors.add(author_id)
+        return Follow(user_id=user_id, author_id=author_id,
+                      created=parse_date(record.get('created')))
+
+    def flush(self, kind):
+        batch = self.pending[kind]
+        if not batch:
+            return
+        self.pending[kind] = []
+        model = type(batch[0])
+        model.objects.bulk_create(batch, batch_size=self.batch_size, ignore_conflicts=True)
+        self.counts[kind] += len(batch)
+        # id новых строк нужны для ссылок: перечитываем их по ключам пачки
+        if kind == 'user':
+            self.users.update(User.objects.filter(
+                username__in=[user.username for user in batch]).values_list('username', 'id'))
+        elif kind == 'group':
+            self.groups.update(Group.objects.filter(
+                slug__in=[group.slug for group in batch]).values_list('slug', 'id'))
+
+    def flush_all(self):
+        for kind in KINDS:
+            self.flush(kind)
+
+    def run(self, records, progress=None):
+        """
+        Загружает записи (словари с полем type) и возвращает Counter
+        записанных строк по типам - дубликаты, которые отбросил
+        ignore_conflicts, тоже учтены. progress(counts) вызывается после
+        каждой сброшенной пачки постов.
+        """
+        post_field = Post._meta.get_field('pub_date')
+        follow_field = Follow._meta.get_field('created')
+        # триггеры поискового индекса остаются: без них загрузка быстрее
+        # лишь на несколько процентов, а правки с сайта во время загрузки
+        # оставили бы в индексе устаревшие строки
+        with explicit_dates(post_field, follow_field):
+            for record in records:
+                posts = self.counts['post']
+                self.add(record)
+                if progress and self.counts['post'] != posts:
+                    progress(self.counts)
+            self.flush_all()
+        return self.counts
+
+    def sync(self):
+        """
+        Досчитывает то, что при обычном save() делают сигналы: счётчики
+        профилей, ленты подписок затронутых авторов, кэши страниц и индекс
+        автодополнения.
+        """
+        counters.reconcile_user_stats()
+        authors = sorted(self.authors)
+        # INSERT ... SELECT на пачку авторов; параметров в запросе не
+        # больше, чем SQLite принимает за раз
+        for start in range(0, len(authors), BACKFILL_AUTHORS):
+            timeline.backfill_followers(authors[start:start + BACKFILL_AUTHORS])
+        feed_cache.bump_feed_version()
+        page_cache.purge(
+            'feed', *['author:{}'.format(pk) for pk in self.authors],
+            *['group:{}'.format(pk) for pk in self.touched_groups])
+        autocomplete.index.invalidate()
+
+
+def read_ndjson(lines, errors):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            errors['invalid'] += 1
+
+
+def rate(count, started):
+    return count / max(time.monotonic() - started, 1e-6)
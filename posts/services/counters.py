@@ -0,0 +1,100 @@
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+def change_comment_count(post_id, delta):
+    # F-выражение: счётчик меняется одним UPDATE без гонок между запросами
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        # разошедшийся счётчик не уводим ниже нуля
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def reconcile_comment_counts(batch_size=1000):
+    """
+    Сверяет Post.comment_count с реальным числом комментариев
+    пачками по batch_size постов. Возвращает число исправленных постов.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', 'comment_count')[:batch_size])
+        if not batch:
+            return fixed
+        last_id = batch[-1][0]
+        actual = dict(Comment.objects.filter(
+            post_id__in=[pk for pk, _ in batch]).order_by().values_list(
+            'post_id').annotate(total=Count('id')))
+        for pk, stored in batch:
+            if actual.get(pk, 0) != stored:
+                Post.objects.filter(pk=pk).update(comment_count=actual.get(pk, 0))
+                fixed += 1
+
+
+def recount_user_stats(user_id):
+    stats, _ = UserStats.objects.update_or_create(user_id=user_id, defaults={
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+    })
+    return stats
+
+
+def change_user_stats(user_id, **deltas):
+    """
+    change_user_stats(user.pk, followers_count=1) - атомарно сдвигает
+    счётчики профиля; если строки ещё нет, считает их с нуля.
+    """
+    updates = {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+    updated = UserStats.objects.filter(user_id=user_id).update(**updates)
+    # при удалении пользователя строки уже нет - пересоздавать её не нужно
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        recount_user_stats(user_id)
+
+
+def get_stats(user):
+    """
+    Счётчики пользователя; если строки почему-то нет, она создаётся.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = recount_user_stats(user.pk)
+        return user.stats
+
+
+def reconcile_user_stats(batch_size=1000):
+    """
+    Сверяет UserStats со строками Follow и Post пачками по batch_size
+    пользователей. Возвращает число исправленных профилей.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        last_id = ids[-1]
+        followers = dict(Follow.objects.filter(author_id__in=ids).order_by().values_list(
+            'author_id').annotate(total=Count('id')))
+        following = dict(Follow.objects.filter(user_id__in=ids).order_by().values_list(
+            'user_id').annotate(total=Count('id')))
+        posts = dict(Post.objects.filter(author_id__in=ids).order_by().values_list(
+            'author_id').annotate(total=Count('id')))
+        stored = {stats.pk: stats for stats in UserStats.objects.filter(user_id__in=ids)}
+        for user_id in ids:
+            actual = (followers.get(user_id, 0), following.get(user_id, 0), posts.get(user_id, 0))
+            stats = stored.get(user_id)
+            if stats and (stats.followers_count, stats.following_count, stats.posts_count) == actual:
+                continue
+            UserStats.objects.update_or_create(user_id=user_id, defaults=dict(zip(
+                ('followers_count', 'following_count', 'posts_count'), actual)))
+            fixed += 1
@@ -0,0 +1,168 @@
+import csv
+import json
+import zlib
+from collections import deque
+
+from django.conf import settings
+
+from posts.models import Comment, Post
+from . import blocking
+from .paginator import NEWER, keyset_filter
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CSV_COLUMNS = ('type', 'id', 'date', 'post_id', 'group', 'image', 'comment_count', 'text')
+
+
+def post_record(post):
+    return {
+        'type': 'post',
+        'id': post.pk,
+        'date': post.pub_date.isoformat(),
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.name or None,
+        'comment_count': post.comment_count,
+        'text': post.text,
+    }
+
+
+def comment_record(comment):
+    return {
+        'type': 'comment',
+        'id': comment.pk,
+        'date': comment.created.isoformat(),
+        'post_id': comment.post_id,
+        'text': comment.text,
+    }
+
+
+def sources(user):
+    # (запрос, ключи keyset, запись): сначала посты, потом комментарии, по датам
+    return [
+        (Post.objects.filter(author=user).select_related('group'), ('pub_date', 'id'), post_record),
+        (Comment.objects.filter(author=user), ('created', 'id'), comment_record),
+    ]
+
+
+def ndjson_line(record):
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    # csv.writer пишет строку в "файл" и сразу отдаёт её нам
+    def write(self, value):
+        return value
+
+
+class Encoder:
+    """
+    Кодирует записи в куски байтов выгрузки: строки NDJSON или CSV
+    склеиваются в куски по EXPORT_BUFFER_SIZE байт (меньше мелких записей
+    в сокет и лучше сжатие), при compress - сжимаются gzip на лету.
+    """
+
+    def __init__(self, format='ndjson', compress=False, size=None):
+        self.size = size or settings.EXPORT_BUFFER_SIZE
+        self.parts, self.length = [], 0
+        # wbits=31 - формат gzip, а не голый zlib
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        if format == 'csv':
+            self.line = csv.DictWriter(Echo(), CSV_COLUMNS, extrasaction='ignore').writerow
+            self.add(self.line(dict(zip(CSV_COLUMNS, CSV_COLUMNS))))
+        else:
+            self.line = ndjson_line
+
+    def add(self, line):
+        data = line.encode()
+        self.parts.append(data)
+        self.length += len(data)
+
+    def flush(self):
+        data = b''.join(self.parts)
+        self.parts, self.length = [], 0
+        return self.compressor.compress(data) if self.compressor else data
+
+    def feed(self, records):
+        """
+        Добавляет записи и возвращает список набравшихся кусков.
+        """
+        chunks = []
+        for record in records:
+            self.add(self.line(record))
+            if self.length >= self.size:
+                chunks.append(self.flush())
+        return [chunk for chunk in chunks if chunk]
+
+    def close(self):
+        chunks = [self.flush()]
+        if self.compressor:
+            chunks.append(self.compressor.flush())
+        return [chunk for chunk in chunks if chunk]
+
+
+class Export:
+    """
+    Выгрузка постов и комментариев пользователя по шагам. step() читает
+    следующие EXPORT_CHUNK_SIZE строк отдельным keyset-запросом и
+    возвращает готовые куски байтов. Между шагами не остаётся открытого
+    курсора, поэтому шаги можно выполнять в разных потоках пула
+    blocking, а память не зависит от числа записей.
+    """
+
+    def __init__(self, user, format='ndjson', compress=False):
+        self.sources = deque(sources(user))
+        self.after = None
+        self.encoder = Encoder(format, compress)
+        self.closed = False
+
+    def step(self):
+        """
+        Куски байтов следующей пачки или None, когда выгрузка закончена.
+        """
+        if not self.sources:
+            if self.closed:
+                return None
+            self.closed = True
+            return self.encoder.close()
+        queryset, keys, record = self.sources[0]
+        if self.after is not None:
+            queryset = queryset.filter(keyset_filter(keys, self.after, NEWER))
+        rows = list(queryset.order_by(*keys)[:settings.EXPORT_CHUNK_SIZE])
+        if len(rows) < settings.EXPORT_CHUNK_SIZE:
+            self.sources.popleft()
+            self.after = None
+        else:
+            self.after = tuple(getattr(rows[-1], key) for key in keys)
+        return self.encoder.feed(record(row) for row in rows)
+
+    def chunks(self):
+        # WSGI и команда export_user: шаги выполняются в этом же потоке
+        while True:
+            chunks = self.step()
+            if chunks is None:
+                return
+            yield from chunks
+
+    async def achunks(self):
+        # ASGI: каждый шаг - в пуле blocking, цикл событий свободен
+        while True:
+            chunks = await blocking.run(self.step)
+            if chunks is None:
+                return
+            for chunk in chunks:
+                yield chunk
+
+
+def stream(user, format='ndjson', compress=False):
+    """
+    Итератор байтов выгрузки пользователя в формате ndjson или csv,
+    при compress - сжатый gzip.
+    """
+    return Export(user, format, compress).chunks()
+
+
+def filename(user, format, compress=False):
+    name = '{}.{}'.format(user.username, format)
+    return name + '.gz' if compress else name
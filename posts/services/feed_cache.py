@@ -0,0 +1,26 @@
+import time
+
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'feed:version'
+
+
+def get_feed_version():
+    """
+    Номер версии ленты для ключей кэша фрагментов. Меняется при любом
+    изменении постов и комментариев, поэтому старые фрагменты просто
+    перестают читаться и TTL можно держать большим.
+    """
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        # после вытеснения ключа не начинаем с уже использованных номеров
+        cache.add(FEED_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        get_feed_version()
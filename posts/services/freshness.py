@@ -0,0 +1,167 @@
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.db.models import CharField, DateTimeField, Exists, F, Func, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat
+from django.http import Http404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from posts.models import Follow, Group, Post, Revision, User
+
+
+def newest_pub_date(**filters):
+    # последний пост ленты - обратный проход по индексу, одна строка
+    return Post.objects.filter(**filters).order_by('-pub_date', '-id').values_list(
+        'pub_date', flat=True)[:1]
+
+
+def tag(prefix, pk):
+    # суррогатный ключ 'author:5' как выражение над колонкой запроса
+    return Concat(Value(prefix + ':'), Cast(pk, CharField()))
+
+
+def changed(*tags):
+    """
+    Подзапрос: время последнего изменения страниц по любому из ключей
+    (строк или выражений tag()), поиск по первичному ключу Revision.
+    """
+    condition = Q()
+    for name in tags:
+        condition |= Q(tag=name)
+    # MAX без GROUP BY: одна строка, без сортировки
+    latest = Func(F('changed'), function='MAX', output_field=DateTimeField())
+    return Subquery(Revision.objects.filter(condition).annotate(latest=latest).values('latest'))
+
+
+def http_date(moment):
+    # в HTTP-дате только секунды: округляем вверх, а пока эта секунда
+    # не прошла, Last-Modified не отдаём - правка в ту же секунду иначе
+    # не заметна по If-Modified-Since
+    if moment.microsecond:
+        moment = moment.replace(microsecond=0) + timedelta(seconds=1)
+    return moment if moment <= timezone.now() else None
+
+
+def make_state(latest, last_change, *facts):
+    """
+    (ETag, Last-Modified) страницы по фактам из базы: дате последнего
+    поста, времени последнего изменения её ключей (Revision) и счётчикам.
+    Всё читается одним запросом из той же базы, что и страница, в том
+    числе из реплики: валидатор одинаков во всех процессах и не
+    опережает данные.
+    """
+    etag = hashlib.md5(repr((latest, last_change, facts)).encode()).hexdigest()
+    moments = [moment for moment in (latest, last_change) if moment is not None]
+    last_modified = http_date(max(moments)) if moments else None
+    return etag, last_modified
+
+
+def feed_state(request):
+    row = Post.objects.order_by('-pub_date', '-id').annotate(
+        last_change=changed('feed'),
+    ).values_list('pub_date', 'last_change').first()
+    return make_state(*row) if row else make_state(None, None)
+
+
+def group_state(request, slug):
+    row = Group.objects.filter(slug=slug).annotate(
+        latest=Subquery(newest_pub_date(group=OuterRef('pk'))),
+        last_change=changed(tag('group', OuterRef('pk'))),
+    ).values_list('latest', 'last_change', 'pk').first()
+    if row is None:
+        raise Http404
+    return make_state(*row)
+
+
+def author_state(request, username, **annotations):
+    row = User.objects.filter(username=username).annotate(
+        latest=Subquery(newest_pub_date(author=OuterRef('pk'))),
+        last_change=changed(tag('author', OuterRef('pk'))),
+        **annotations,
+    ).values_list(
+        'latest', 'last_change', 'pk', 'stats__posts_count', 'stats__followers_count',
+        'stats__following_count', *annotations,
+    ).first()
+    if row is None:
+        raise Http404
+    return make_state(*row)
+
+
+def profile_state(request, username):
+    # кнопка «Подписаться/Отписаться» зависит от читателя
+    annotations = {}
+    if request.user.is_authenticated:
+        annotations['is_following'] = Exists(
+            Follow.objects.filter(user=request.user, author=OuterRef('pk')))
+    return author_state(request, username, **annotations)
+
+
+def post_state(request, username, post_id):
+    post = Post.objects.filter(pk=post_id)
+    row = User.objects.filter(username=username).annotate(
+        post_author=Subquery(post.values('author_id')[:1]),
+        post_group=Subquery(post.values('group_id')[:1]),
+    ).annotate(
+        last_change=changed(
+            'post:{}'.format(post_id), tag('author', OuterRef('pk')),
+            tag('author', OuterRef('post_author')), tag('group', OuterRef('post_group'))),
+    ).values_list(
+        'last_change', 'pk', 'post_author', 'post_group', 'stats__posts_count',
+        'stats__followers_count', 'stats__following_count',
+    ).first()
+    if row is None or row[2] is None:
+        raise Http404
+    return make_state(None, *row)
+
+
+def viewer_facts(request):
+    # от читателя зависят шапка страницы, счётчик непрочитанных в ней и
+    # токен CSRF в формах: после входа он другой, и старая форма дала бы 403
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    stats = getattr(user, 'stats', None)
+    return (user.pk, stats.unread_posts if stats is not None else 0,
+            request.META.get('CSRF_COOKIE'))
+
+
+def conditional(state_func, per_user=False, max_age=0):
+    """
+    Условный GET: state_func(request, *args, **kwargs) одним запросом
+    считает (ETag, Last-Modified), и на If-None-Match/If-Modified-Since
+    страница отвечает 304, не выполняя представление. Валидаторы
+    считаются один раз на запрос.
+
+    per_user - страница зависит от читателя: в ETag входит пользователь,
+    ответ вошедшему помечается private и отдаётся без Last-Modified (по
+    одной дате нельзя понять, что у него изменился счётчик в шапке).
+    """
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, 'validators'):
+            etag, last_modified = state_func(request, *args, **kwargs)
+            viewer = viewer_facts(request) if per_user else None
+            if etag is not None and viewer is not None:
+                etag = hashlib.md5(repr((etag, viewer)).encode()).hexdigest()
+                last_modified = None
+            request.validators = etag, last_modified
+        return request.validators
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda *args, **kwargs: get_state(*args, **kwargs)[0],
+            last_modified_func=lambda *args, **kwargs: get_state(*args, **kwargs)[1],
+        )(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # и 200, и 304: кэши перепроверяют ответ по валидаторам,
+            # а страницу вошедшего пользователя хранит только его браузер
+            scope = 'private' if per_user and request.user.is_authenticated else 'public'
+            patch_cache_control(response, max_age=max_age, **{scope: True})
+            return response
+        return wrapper
+    return decorator
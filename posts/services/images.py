@@ -0,0 +1,115 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# модуль импортируется в дочерних процессах пула: здесь только Pillow,
+# настройки Django читаются в родительском процессе и передаются аргументами
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png'}
+
+_pool = None
+
+
+class ImageRejected(ValueError):
+    pass
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def process_image(source, max_pixels, max_size, quality):
+    """
+    Проверяет и пережимает загруженную картинку.
+
+    source - путь к временному файлу или байты небольшой загрузки.
+    Размер и формат читаются из заголовка без декодирования, крупный
+    JPEG сразу декодируется в уменьшенном виде (draft), EXIF не
+    сохраняется. Возвращает (байты, формат) или None, если файл нужно
+    оставить как есть (анимированный GIF).
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError:
+        raise ImageRejected('Слишком большое изображение')
+    except (OSError, SyntaxError):
+        raise ImageRejected('Файл не является изображением')
+
+    with image:
+        if image.format not in ALLOWED_FORMATS:
+            raise ImageRejected('Формат {} не поддерживается'.format(image.format))
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageRejected('Изображение больше {} мегапикселей'.format(
+                max_pixels // 1000000))
+        if getattr(image, 'is_animated', False):
+            return None
+
+        # JPEG-декодер масштабирует в 2-8 раз прямо при чтении
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size), Image.LANCZOS, reducing_gap=3.0)
+
+        if has_alpha(image):
+            format, image = 'PNG', image.convert('RGBA')
+        else:
+            format, image = 'JPEG', image.convert('RGB')
+        buffer = io.BytesIO()
+        # EXIF не передаём, цветовой профиль сохраняем
+        image.save(buffer, format, quality=quality, optimize=True,
+                   icc_profile=image.info.get('icc_profile'))
+        return buffer.getvalue(), format
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn, а не fork: родитель держит соединения с базой и потоки
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_INGEST_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def ingest(upload):
+    """
+    Прогоняет загруженный файл через process_image в пуле процессов
+    (IMAGE_INGEST_WORKERS, 0 - в текущем процессе). Возвращает
+    (байты, имя файла) или None, если загрузку надо сохранить как есть.
+    """
+    global _pool
+    if hasattr(upload, 'temporary_file_path'):
+        # крупная загрузка уже лежит на диске - передаём только путь
+        source = upload.temporary_file_path()
+    else:
+        upload.seek(0)
+        source = upload.read()
+    args = (source, settings.IMAGE_MAX_PIXELS, settings.IMAGE_MAX_SIZE, settings.IMAGE_QUALITY)
+
+    if settings.IMAGE_INGEST_WORKERS:
+        try:
+            result = get_pool().submit(process_image, *args).result(
+                timeout=settings.IMAGE_INGEST_TIMEOUT)
+        except BrokenProcessPool:
+            # процесс убит (например, по памяти) - следующий запрос создаст пул заново
+            _pool = None
+            raise ImageRejected('Не удалось обработать изображение')
+        except TimeoutError:
+            raise ImageRejected('Изображение обрабатывается слишком долго')
+    else:
+        result = process_image(*args)
+
+    if result is None:
+        return None
+    content, format = result
+    root = os.path.splitext(os.path.basename(upload.name))[0]
+    return content, '{}.{}'.format(root, EXTENSIONS[format])
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from posts.models import Job
+
+logger = logging.getLogger(__name__)
+
+# имя задачи -> (функция, параметры по умолчанию)
+registry = {}
+
+
+def task(name, priority=0, max_attempts=5):
+    """
+    Регистрирует функцию как задачу очереди. Аргументы задачи передаются
+    именованными и должны сериализоваться в JSON; имена name, key,
+    priority и delay заняты параметрами enqueue.
+    """
+    def decorator(func):
+        registry[name] = (func, {'priority': priority, 'max_attempts': max_attempts})
+        return func
+    return decorator
+
+
+def enqueue(name, key=None, priority=None, delay=0, **payload):
+    """
+    Ставит задачу в очередь и возвращает Job. Если задача с тем же
+    ключом key ещё ждёт, новая не создаётся - возвращается существующая.
+    Задача с тем же ключом, которая уже выполняется, могла прочитать
+    данные до нового изменения, поэтому за ней ставится следующая.
+    Строка задачи коммитится вместе с транзакцией вызывающего кода, так
+    что задача не потеряется и не увидит незакоммиченных данных.
+
+    При JOBS_RUN_INLINE задача выполняется в этом же процессе сразу после
+    коммита (для разработки и тестов).
+    """
+    defaults = registry[name][1]
+    options = {
+        'name': name,
+        'payload': json.dumps(payload),
+        'priority': defaults['priority'] if priority is None else priority,
+        'max_attempts': defaults['max_attempts'],
+        'run_at': timezone.now() + timedelta(seconds=delay),
+        'key': key,
+    }
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(**options)
+    except IntegrityError:
+        existing = Job.objects.filter(key=key, status=Job.QUEUED).first()
+        if existing is None:
+            raise
+        return existing
+
+    if settings.JOBS_RUN_INLINE:
+        transaction.on_commit(lambda: run_inline(job.pk))
+    return job
+
+
+def run_inline(pk):
+    if claim(pk, 'inline'):
+        execute(Job.objects.get(pk=pk))
+
+
+def claim(pk, worker):
+    # условный UPDATE: из нескольких воркеров задачу получит один
+    return Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=worker, locked_at=timezone.now(),
+        attempts=F('attempts') + 1) == 1
+
+
+def claim_next(worker):
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now(),
+    ).order_by('-priority', 'run_at', 'id').values_list('id', flat=True)[:10]
+    for pk in candidates:
+        if claim(pk, worker):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+                settings.JOBS_RETRY_BACKOFF_MAX)
+    # разброс, чтобы упавшие вместе задачи не повторялись разом
+    return delay * random.uniform(1, 1.25)
+
+
+def execute(job):
+    """
+    Выполняет захваченную задачу. Ошибка переводит её обратно в очередь
+    с экспоненциальной задержкой, после max_attempts попыток - в FAILED.
+    """
+    try:
+        func = registry[job.name][0]
+        func(**json.loads(job.payload))
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s упала (попытка %s)', job, job.attempts)
+        if job.attempts >= job.max_attempts or not retry(job, error, backoff(job.attempts)):
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, finished=timezone.now())
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished=timezone.now())
+    return True
+
+
+def retry(job, error, delay=0):
+    """
+    Возвращает задачу в очередь через delay секунд. Если в очереди уже
+    ждёт задача с тем же ключом, она сделает ту же работу по более свежим
+    данным - тогда повтор не нужен и возвращается False.
+    """
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay))
+    except IntegrityError:
+        return False
+    return True
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь задачи, захваченные воркером, который упал,
+    не закончив их. Возвращает их число.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.JOBS_STALE_TIMEOUT)
+    requeued = 0
+    for job in Job.objects.filter(status=Job.RUNNING, locked_at__lt=deadline):
+        error = 'Воркер {} не закончил задачу'.format(job.locked_by)
+        if retry(job, error):
+            requeued += 1
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, finished=timezone.now())
+    return requeued
+
+
+def worker_name():
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def work(stop=lambda: False, until_empty=False, poll=None):
+    """
+    Цикл воркера: берёт задачи по приоритету, пока stop() не вернёт True.
+    С until_empty выходит, когда готовых задач не осталось.
+    Возвращает число выполненных задач.
+
+    Брошенные задачи ищутся раз в JOBS_STALE_CHECK_INTERVAL секунд:
+    воркер может упасть и после того, как остальные уже запущены.
+    """
+    name = worker_name()
+    poll = settings.JOBS_POLL_INTERVAL if poll is None else poll
+    done = 0
+    next_check = 0
+    while not stop():
+        try:
+            if time.monotonic() >= next_check:
+                requeue_stale()
+                next_check = time.monotonic() + settings.JOBS_STALE_CHECK_INTERVAL
+            job = claim_next(name)
+        except OperationalError:
+            # база занята другим процессом - попробуем позже
+            job = None
+        if job is None:
+            if until_empty:
+                break
+            time.sleep(poll)
+            continue
+        execute(job)
+        done += 1
+    return done
+
+
+def purge_finished(days):
+    deadline = timezone.now() - timedelta(days=days)
+    return Job.objects.filter(status=Job.DONE, finished__lt=deadline).delete()[0]
@@ -0,0 +1,109 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import Count, F
+
+from posts.models import ImageVariant, MediaBlob, Post
+from . import jobs, thumbnails
+
+logger = logging.getLogger(__name__)
+
+
+def get_storage():
+    return Post._meta.get_field('image').storage
+
+
+def retain(name):
+    if not name:
+        return
+    blob, created = MediaBlob.objects.get_or_create(name=name, defaults={'refcount': 1})
+    if not created:
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """
+    Снимает ссылку поста на файл. Когда ссылок не осталось, файл и его
+    превью удаляет фоновая задача.
+    """
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+    jobs.enqueue('media.collect', key='media.collect:' + name, source=name)
+
+
+def collect(name):
+    """
+    Удаляет файл без ссылок и его превью. Загрузка того же содержимого
+    берёт существующий файл ещё до коммита своего поста - такой файл
+    хранилище не удаляет, и сборка повторяется через MEDIA_COLLECT_GRACE
+    секунд.
+    """
+    if (MediaBlob.objects.filter(name=name, refcount__gt=0).exists()
+            or Post.objects.filter(image=name).exists()):
+        return
+    if not delete_file(name):
+        # при JOBS_RUN_INLINE отложенная задача выполнилась бы тут же, по кругу
+        if not settings.JOBS_RUN_INLINE:
+            jobs.enqueue('media.collect', key='media.collect:' + name,
+                         delay=settings.MEDIA_COLLECT_GRACE, source=name)
+        return
+    MediaBlob.objects.filter(name=name, refcount=0).delete()
+
+
+def delete_file(name):
+    try:
+        if not get_storage().delete_unused(name, settings.MEDIA_COLLECT_GRACE):
+            return False
+    except SuspiciousFileOperation:
+        # путь вне MEDIA_ROOT: файлом управляет не хранилище
+        logger.warning('Файл %s вне хранилища, не удаляем', name)
+    for variant in ImageVariant.objects.filter(source=name):
+        default_storage.delete(variant.name)
+    ImageVariant.objects.filter(source=name).delete()
+    thumbnails.variants_cache.delete(name)
+    return True
+
+
+def reconcile_refcounts():
+    """
+    Пересчитывает MediaBlob по постам. Возвращает число исправленных строк.
+    """
+    actual = dict(Post.objects.exclude(image='').exclude(image__isnull=True).values(
+        'image').annotate(count=Count('id')).values_list('image', 'count'))
+    fixed = 0
+    for blob in MediaBlob.objects.all():
+        count = actual.pop(blob.name, 0)
+        if blob.refcount != count:
+            MediaBlob.objects.filter(name=blob.name).update(refcount=count)
+            fixed += 1
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, refcount=count) for name, count in actual.items()])
+    return fixed + len(actual)
+
+
+def migrate_file(name):
+    """
+    Переносит файл со старым именем в хранилище по содержимому и
+    переключает на него посты и превью. Возвращает новое имя.
+    """
+    storage = get_storage()
+    with storage.open(name) as content:
+        new_name = storage.save(name, content)
+    if new_name == name:
+        return name
+    Post.objects.filter(image=name).update(image=new_name)
+    if ImageVariant.objects.filter(source=new_name).exists():
+        stale = ImageVariant.objects.filter(source=name)
+        for variant in stale:
+            default_storage.delete(variant.name)
+        stale.delete()
+        thumbnails.variants_cache.delete(name)
+    else:
+        # превью остаются теми же файлами, меняется только источник
+        ImageVariant.objects.filter(source=name).update(source=new_name)
+        thumbnails.variants_cache.delete(name)
+    storage.delete(name)
+    return new_name
@@ -0,0 +1,110 @@
+import itertools
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.template.loader import render_to_string
+
+from posts.models import Follow, Post, UserStats
+from . import jobs
+
+
+def get_window(moment):
+    size = settings.NOTIFY_WINDOW
+    start = int(moment.timestamp()) // size * size
+    return start, start + size
+
+
+def schedule(post):
+    """
+    Ставит уведомление о посте. Все посты автора в одном окне
+    NOTIFY_WINDOW попадают в одну задачу по ключу и уходят одним письмом
+    после конца окна.
+    """
+    start, end = get_window(post.pub_date)
+    jobs.enqueue(
+        'notifications.new_posts', key='notify:{}:{}'.format(post.author_id, start),
+        delay=max(0, end - time.time()) + settings.NOTIFY_GRACE,
+        author_id=post.author_id, start=start, end=end)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def split_followers(author_id, start, end):
+    """
+    Делит подписчиков автора на пачки по NOTIFY_BATCH_SIZE и ставит по
+    задаче на пачку: повтор после сбоя отправки затронет только её.
+    Возвращает число пачек.
+    """
+    post_ids = list(Post.objects.filter(
+        author_id=author_id,
+        pub_date__gte=datetime.fromtimestamp(start, timezone.utc),
+        pub_date__lt=datetime.fromtimestamp(end, timezone.utc),
+    ).order_by('pub_date', 'id').values_list('id', flat=True))
+    if not post_ids:
+        return 0
+    follow_ids = Follow.objects.filter(author_id=author_id).order_by('id').values_list(
+        'id', flat=True).iterator()
+    batches = 0
+    for chunk in chunked(follow_ids, settings.NOTIFY_BATCH_SIZE):
+        jobs.enqueue(
+            'notifications.send_batch',
+            key='notify:{}:{}:{}'.format(author_id, start, chunk[0]),
+            author_id=author_id, post_ids=post_ids, first_id=chunk[0], last_id=chunk[-1])
+        batches += 1
+    return batches
+
+
+def build_message(posts):
+    author = posts[0].author
+    subject = 'Новые записи @{}'.format(author.username)
+    if len(posts) > 1:
+        subject += ' ({})'.format(len(posts))
+    body = render_to_string('emails/new_posts.txt', {
+        'author': author,
+        'posts': posts,
+        'domain': Site.objects.get_current().domain,
+    })
+    return subject, body
+
+
+def send_batch(author_id, post_ids, first_id, last_id):
+    """
+    Отправляет письмо подписчикам с Follow.id в [first_id, last_id]
+    через одно соединение с почтовым сервером и увеличивает их счётчик
+    непрочитанных. Возвращает число отправленных писем.
+    """
+    posts = list(Post.objects.filter(pk__in=post_ids).select_related(
+        'author').order_by('pub_date', 'id'))
+    if not posts:
+        return 0
+    followers = list(Follow.objects.filter(
+        author_id=author_id, id__gte=first_id, id__lte=last_id,
+    ).values_list('user_id', 'user__email'))
+
+    subject, body = build_message(posts)
+    messages = [EmailMessage(subject, body, to=[email]) for _, email in followers if email]
+    if messages:
+        with get_connection() as connection:
+            connection.send_messages(messages)
+    UserStats.objects.filter(user_id__in=[user_id for user_id, _ in followers]).update(
+        unread_posts=F('unread_posts') + len(posts))
+    return len(messages)
+
+
+def mark_read(user):
+    # строка уже загружена вместе с пользователем - UPDATE только если есть что сбрасывать
+    stats = getattr(user, 'stats', None)
+    if stats is not None and stats.unread_posts:
+        UserStats.objects.filter(user=user).update(unread_posts=0)
+        stats.unread_posts = 0
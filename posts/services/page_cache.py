@@ -0,0 +1,135 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from posts.models import Revision
+
+PAGE_PREFIX = 'page:'
+GENERATION_PREFIX = 'generation:'
+CLOCK_KEY = 'generation-clock'
+
+
+def page_key(request):
+    url = request.build_absolute_uri()
+    return PAGE_PREFIX + hashlib.md5(url.encode()).hexdigest()
+
+
+def tag(request, *keys):
+    """
+    Помечает страницу суррогатными ключами ('post:1', 'author:5', ...).
+    Без пометки AnonymousPageCacheMiddleware страницу не кэширует.
+    """
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    request.surrogate_keys.update(keys)
+
+
+def current(key):
+    # вытесненный счётчик заводится заново от текущего времени в
+    # миллисекундах - со старыми снимками он не совпадёт
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), None)
+        value = cache.get(key)
+    return value
+
+
+def generations(tags):
+    """
+    Текущие поколения суррогатных ключей; purge() увеличивает их
+    атомарным incr.
+    """
+    keys = [GENERATION_PREFIX + name for name in tags]
+    known = cache.get_many(keys)
+    for key in keys:
+        if key not in known:
+            known[key] = current(key)
+    return known
+
+
+def clock():
+    """
+    Счётчик всех сбросов. Middleware читает его до рендеринга страницы:
+    ключи страницы тогда ещё неизвестны, а сброс, случившийся во время
+    рендеринга, мог разминуться с прочитанными данными.
+    """
+    return current(CLOCK_KEY)
+
+
+def store(key, response, tags, started, timeout=None):
+    """
+    Кэширует страницу вместе с поколениями её ключей. started - clock()
+    до рендеринга: если с тех пор был сброс, страница не кэшируется -
+    она могла собраться из данных до него, а запомнила бы поколения
+    после. Возвращает, закэширована ли страница.
+    """
+    if timeout is None:
+        timeout = settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+    # поколения читаются раньше счётчика: purge() увеличивает их позже
+    stored = generations(tags)
+    if clock() != started:
+        return False
+    cache.set(key, (stored, response), timeout)
+    return True
+
+
+def fetch(key):
+    """
+    Страница из кэша или None, если с момента её записи какой-то из её
+    ключей сбрасывали.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    stored, response = entry
+    if cache.get_many(list(stored)) != stored:
+        return None
+    return response
+
+
+def purge(*tags):
+    """
+    Сбрасывает все страницы, помеченные указанными ключами: их поколения
+    перестают совпадать с текущими. Кэш сбрасывается после коммита -
+    иначе страница, собранная до него, попала бы в кэш под новым
+    поколением; время изменения в Revision пишется в той же транзакции.
+    """
+    touch(tags)
+    transaction.on_commit(lambda: expire(tags))
+
+
+def expire(tags):
+    # сначала счётчик, потом поколения - см. store()
+    for key in [CLOCK_KEY] + [GENERATION_PREFIX + name for name in tags]:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # поколения нет - нет и страниц, которые его запомнили
+            pass
+
+
+def touch(tags):
+    """
+    Записывает время изменения ключей в Revision - из него
+    posts.services.freshness строит валидаторы условных GET. Обычно это
+    один UPDATE, новые ключи добавляются INSERT'ом.
+    """
+    tags = set(tags)
+    now = timezone.now()
+    revisions = Revision.objects.filter(tag__in=tags)
+    if revisions.update(changed=now) < len(tags):
+        known = set(revisions.values_list('tag', flat=True))
+        Revision.objects.bulk_create(
+            [Revision(tag=name, changed=now) for name in tags - known],
+            ignore_conflicts=True)
+
+
+def post_tags(post, group_id=None):
+    tags = ['feed', 'post:{}'.format(post.pk), 'author:{}'.format(post.author_id)]
+    for pk in {post.group_id, group_id} - {None}:
+        tags.append('group:{}'.format(pk))
+    return tags
@@ -0,0 +1,164 @@
+import collections.abc
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Номерные страницы отдаём только на небольшой глубине, дальше - курсор.
+MAX_NUMBERED_PAGES = getattr(settings, 'PAGINATOR_MAX_NUMBERED_PAGES', 10)
+
+OLDER = 'older'
+NEWER = 'newer'
+
+
+def encode_cursor(obj, keys=('pub_date', 'id')):
+    date_key, id_key = keys
+    raw = '{}|{}'.format(getattr(obj, date_key).isoformat(), getattr(obj, id_key))
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """
+    Возвращает пару (дата, id) или None, если курсор испорчен.
+    """
+    try:
+        raw = force_str(urlsafe_base64_decode(cursor))
+        date, pk = raw.rsplit('|', 1)
+        date = parse_datetime(date)
+        if date is None:
+            return None
+        return date, int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_filter(keys, value, direction=OLDER):
+    """
+    Условие "строго старше/новее (дата, id)" в виде, который SQLite
+    умеет отдавать диапазоном по индексу на дату.
+    """
+    date_key, id_key = keys
+    date, pk = value
+    if direction == NEWER:
+        return Q(**{date_key + '__gte': date}) & ~Q(**{date_key: date, id_key + '__lte': pk})
+    return Q(**{date_key + '__lte': date}) & ~Q(**{date_key: date, id_key + '__gte': pk})
+
+
+def keyset_ordering(keys, direction=OLDER):
+    if direction == NEWER:
+        return keys
+    return tuple('-' + key for key in keys)
+
+
+class CursorPage(collections.abc.Sequence):
+    """
+    Страница курсорной пагинации. Повторяет интерфейс Page, которым
+    пользуются шаблоны, но номера страниц у неё нет.
+    """
+    number = None
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of {} objects>'.format(len(self))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (дата, id): каждая страница - это один запрос
+    с LIMIT, без COUNT(*) и без OFFSET.
+    """
+    page_range = range(0)
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def fetch(self, value, direction):
+        # ленты из нескольких источников умеют выбирать страницу сами
+        if hasattr(self.object_list, 'keyset'):
+            return self.object_list.keyset(value, direction, self.per_page + 1)
+        queryset = self.object_list
+        if value is not None:
+            queryset = queryset.filter(keyset_filter(self.keys, value, direction))
+        queryset = queryset.order_by(*keyset_ordering(self.keys, direction))
+        return list(queryset[:self.per_page + 1])
+
+    def get_page(self, cursor=None, direction=OLDER):
+        value = decode_cursor(cursor) if cursor else None
+        if value is None:
+            direction = OLDER
+        direction = NEWER if direction == NEWER else OLDER
+
+        items = self.fetch(value, direction)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == NEWER:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, value is not None
+
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = encode_cursor(items[-1], self.keys)
+        if items and has_previous:
+            previous_cursor = encode_cursor(items[0], self.keys)
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+def bounded_count(object_list, limit):
+    """
+    COUNT(*) не дальше limit строк: глубже номерных страниц всё равно нет.
+    """
+    if isinstance(object_list, QuerySet):
+        return object_list[:limit].count()
+    return object_list.count(limit)
+
+
+def paginate(request, object_list, per_page, keys=('pub_date', 'id')):
+    """
+    Возвращает (paginator, page) для ленты.
+
+    Первые MAX_NUMBERED_PAGES страниц - обычный Paginator по ?page=,
+    с ограниченным подсчётом. Последняя номерная страница ссылается
+    дальше курсором, а ?cursor= обслуживает CursorPaginator.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        paginator = CursorPaginator(object_list, per_page, keys)
+        return paginator, paginator.get_page(cursor, request.GET.get('dir'))
+
+    paginator = Paginator(object_list, per_page)
+    limit = per_page * MAX_NUMBERED_PAGES
+    count = bounded_count(object_list, limit + 1)
+    # count - cached_property, подставляем ограниченное значение
+    paginator.__dict__['count'] = min(count, limit)
+    page = paginator.get_page(request.GET.get('page'))
+    if count > limit and page.number == paginator.num_pages:
+        page.next_cursor = encode_cursor(page[len(page) - 1], keys)
+    return paginator, page
@@ -1,40 +1,54 @@
-from posts.models import Post, Group, User, Comment
+from posts.models import Post, Group, User, Comment, Follow
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
 import datetime as dt
-from django.core.paginator import Paginator
+from .paginator import CursorPaginator, encode_cursor, paginate
+from .counters import get_stats
+from .feed_cache import get_feed_version
+from . import replicas, search
 
 
-def get_latest_posts(request, limit=10):
-    post_list = Post.objects.order_by("-pub_date").all()
-    # показывать по 10 записей на странице.
-    paginator = Paginator(post_list, 10)
+def latest_posts():
+    return Post.objects.select_related('author', 'group').order_by('-pub_date', '-id')
+
+
+def group_posts(group):
+    return latest_posts().filter(group=group)
+
 
-    # переменная в URL с номером запрошенной страницы
-    page_number = request.GET.get('page')
-    # получить записи с нужным смещением
-    page = paginator.get_page(page_number)
-    return {'page': page, 'paginator': paginator}
+def author_posts(user):
+    return latest_posts().filter(author=user)
+
+
+def get_latest_posts(request, limit=10):
+    post_list = latest_posts()
+    # показывать по limit записей на странице, номер или курсор берём из URL
+    paginator, page = paginate(request, post_list, limit)
+    return {
+        'page': page,
+        'paginator': paginator,
+        # ключ кэша фрагмента в index.html
+        'feed_version': get_feed_version(),
+        'cache_timeout': replicas.cache_timeout(settings.INDEX_PAGE_CACHE_TIMEOUT),
+    }
 
 
 def get_page_setup(request, slug):
     # Return 404 error if not found
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(post_list, 5)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group_posts(group)
+    paginator, page = paginate(request, post_list, 5)
     return {'group': group, 'paginator': paginator, 'page': page}
 
 
-def search_keyword(request):
-    keyword = request.GET.get("q", None)
+def search_keyword(request, limit=10):
+    keyword = request.GET.get("q", '').strip()
+    posts, next_cursor = [], None
     if keyword:
-        posts = Post.objects.select_related(
-            'author', 'group').filter(text__contains=keyword)
-    else:
-        posts = None
+        posts, next_cursor = search.search_posts(
+            keyword, request.GET.get('cursor'), limit)
 
-    return {'posts': posts, 'keyword': keyword}
+    return {'posts': posts, 'keyword': keyword, 'next_cursor': next_cursor}
 
 
 def get_user_subscribers(r_user):
@@ -42,19 +56,45 @@ def get_user_subscribers(r_user):
 
 
 def get_user_info(request, username):
-    user = get_object_or_404(User, username__exact=username)
-    post_list = user.author_posts.all().order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    # переменная в URL с номером запрошенной страницы
-    page_number = request.GET.get('page')
-    # получить записи с нужным смещением
-    page = paginator.get_page(page_number)
-    print('Tracking : ', user.tracking.count())
-    print('Followers :', user.followers.count())
-    return {'profile': user, 'paginator': paginator, 'page': page}
+    user = get_object_or_404(User.objects.select_related('stats'), username__exact=username)
+    # счётчики боковой панели берём из UserStats, без COUNT(*)
+    get_stats(user)
+    post_list = author_posts(user)
+    paginator, page = paginate(request, post_list, 10)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=user).exists()
+    return {'profile': user, 'paginator': paginator, 'page': page, 'following': following}
+
+
+COMMENT_KEYS = ('created', 'id')
+
+
+def get_comments(post_id, cursor=None, limit=None):
+    """
+    Порция комментариев поста по ключу (created, id), новые сначала.
+    Авторы приходят тем же запросом, без COUNT(*) и OFFSET.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    paginator = CursorPaginator(comments, limit or settings.COMMENTS_PAGE_SIZE, COMMENT_KEYS)
+    return paginator.get_page(cursor)
+
+
+def get_first_comments(post, limit=None):
+    """
+    Первая порция комментариев для страницы поста: QuerySet с LIMIT и
+    курсор следующей порции. Есть ли она, видно по Post.comment_count,
+    без лишнего запроса.
+    """
+    limit = limit or settings.COMMENTS_PAGE_SIZE
+    comments = post.comments.select_related('author').order_by('-created', '-id')[:limit]
+    next_cursor = None
+    if post.comment_count > limit and comments:
+        next_cursor = encode_cursor(comments[len(comments) - 1], COMMENT_KEYS)
+    return comments, next_cursor
 
 
 def get_single_page(username, post_id):
-    user = get_object_or_404(User, username__exact=username)
-    post = get_object_or_404(Post, pk=post_id)
+    user = get_object_or_404(User.objects.select_related('stats'), username__exact=username)
+    get_stats(user)
+    post = get_object_or_404(Post.objects.select_related('author', 'group'), pk=post_id)
     return {'post_view': user, 'post': post}
@@ -0,0 +1,122 @@
+import contextvars
+import functools
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# реплика, из которой читает текущая страница; None - основная база
+_current = contextvars.ContextVar('replica', default=None)
+
+
+def current():
+    return _current.get()
+
+
+def get_path(alias):
+    return connections[alias].settings_dict['NAME']
+
+
+def refreshed_at(alias):
+    """
+    Когда реплика обновлялась последний раз (unix time); None, если её ещё нет.
+    """
+    try:
+        return os.path.getmtime(get_path(alias))
+    except OSError:
+        return None
+
+
+def lag(alias):
+    refreshed = refreshed_at(alias)
+    return None if refreshed is None else time.time() - refreshed
+
+
+def is_fresh(alias):
+    delay = lag(alias)
+    return delay is not None and delay <= settings.DATABASE_REPLICA_MAX_LAG
+
+
+def choose():
+    fresh = [alias for alias in settings.DATABASE_REPLICAS if is_fresh(alias)]
+    return random.choice(fresh) if fresh else None
+
+
+@contextmanager
+def reading(alias):
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+def pin(request):
+    # запись на GET-странице: следующие чтения пользователя - из основной базы
+    request.pin_primary = True
+
+
+def has_written(request):
+    return request.method not in SAFE_METHODS or getattr(request, 'pin_primary', False)
+
+
+def is_pinned(request):
+    return settings.DATABASE_PIN_COOKIE in request.COOKIES
+
+
+def read_only(view):
+    """
+    Страница только читает: её запросы уходят в одну свежую реплику на
+    весь запрос. Пользователь, недавно что-то записавший (cookie
+    закрепления), и все запросы при отставших репликах читают из
+    основной базы. Сессия и пользователь запроса загружаются лениво -
+    их читаем из основной базы до выбора реплики: в снимке реплики
+    может ещё не быть недавнего входа.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        load_user(request)
+        alias = None
+        if request.method in SAFE_METHODS and not is_pinned(request):
+            alias = choose()
+        request.replica = alias
+        with reading(alias):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def load_user(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated
+
+
+def cache_timeout(timeout):
+    # страница из реплики может отставать - кэшируем её не дольше допустимого отставания
+    if current() is None:
+        return timeout
+    return min(timeout, settings.DATABASE_REPLICA_MAX_LAG)
+
+
+def refresh(alias):
+    """
+    Копирует основную базу SQLite в файл реплики через backup API:
+    копия согласованная, а открытые соединения реплики видят новые данные
+    без переподключения. Время изменения файла - отметка свежести для
+    lag(): время начала копирования, снимок не новее его.
+    """
+    started = time.time()
+    source = connections['default']
+    source.ensure_connection()
+    path = get_path(alias)
+    target = sqlite3.connect(path, timeout=30)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+    os.utime(path, (started, started))
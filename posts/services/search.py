@@ -0,0 +1,174 @@
+import re
+
+from django.db import DatabaseError, connection, connections, router
+from django.utils.encoding import force_bytes, force_str
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from posts.models import Post
+from .paginator import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+
+# границы подсветки, которых не бывает в тексте: экранируем сниппет
+# целиком и только потом превращаем их в <mark>
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS {t}_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {t}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {t}_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {t}({t}, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {t}_au AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {t}({t}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {t}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+
+def install_index(using=connection):
+    """
+    Создаёт FTS5-таблицу поверх posts_post и триггеры, которые держат её
+    в синхронизации с Post.text. Повторный вызов безопасен: триггеры
+    пропадают, когда миграция пересоздаёт posts_post, и ставятся заново.
+    Возвращает False, если база не SQLite или собрана без FTS5.
+    """
+    if using.vendor != 'sqlite':
+        return False
+    try:
+        with using.cursor() as cursor:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS {t} USING fts5("
+                "text, content='posts_post', content_rowid='id', "
+                "tokenize='unicode61')".format(t=FTS_TABLE))
+            for trigger in TRIGGERS:
+                cursor.execute(trigger.format(t=FTS_TABLE))
+    except DatabaseError:
+        return False
+    return True
+
+
+def drop_index(using=connection):
+    if using.vendor != 'sqlite':
+        return
+    with using.cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute('DROP TRIGGER IF EXISTS {}_{}'.format(FTS_TABLE, suffix))
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(FTS_TABLE))
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite' and FTS_TABLE in using.introspection.table_names()
+
+
+def rebuild_index(batch_size=1000, using=connection):
+    """
+    Заново наполняет индекс из posts_post пачками по batch_size строк.
+    Возвращает число проиндексированных постов.
+    """
+    if not install_index(using):
+        return 0
+    with using.cursor() as cursor:
+        cursor.execute("INSERT INTO {t}({t}) VALUES ('delete-all')".format(t=FTS_TABLE))
+    indexed = 0
+    last_id = 0
+    while True:
+        with using.cursor() as cursor:
+            cursor.execute(
+                'SELECT max(id), count(*) FROM (SELECT id FROM posts_post '
+                'WHERE id > %s ORDER BY id LIMIT %s)', [last_id, batch_size])
+            top, count = cursor.fetchone()
+            if not count:
+                return indexed
+            cursor.execute(
+                'INSERT INTO {t}(rowid, text) SELECT id, text FROM posts_post '
+                'WHERE id > %s AND id <= %s'.format(t=FTS_TABLE), [last_id, top])
+        indexed += count
+        last_id = top
+
+
+def build_match(query):
+    """
+    Превращает пользовательский запрос в выражение MATCH: каждое слово -
+    отдельная фраза в кавычках, последнее ищется как префикс.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = ['"{}"'.format(word) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def encode_cursor(rank, pk):
+    return urlsafe_base64_encode(force_bytes('{!r}|{}'.format(rank, pk)))
+
+
+def decode_cursor(cursor):
+    try:
+        rank, pk = force_str(urlsafe_base64_decode(cursor)).rsplit('|', 1)
+        return float(rank), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def highlight(snippet):
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search_posts(query, cursor=None, limit=10):
+    """
+    Ищет посты по FTS5 с ранжированием BM25.
+
+    Возвращает (посты, курсор следующей страницы). У каждого поста
+    есть атрибут snippet - фрагмент текста с подсвеченными словами.
+    Страницы листаются по ключу (rank, id), без OFFSET.
+    """
+    match = build_match(query)
+    if match is None:
+        return [], None
+    # raw SQL мимо ORM: базу для чтения спрашиваем у роутера сами
+    using = connections[router.db_for_read(Post)]
+    if not is_available(using):
+        return search_posts_fallback(query, cursor, limit)
+
+    sql = (
+        "SELECT rowid, bm25({t}) AS rank, "
+        "snippet({t}, 0, %s, %s, '…', 16) FROM {t} WHERE {t} MATCH %s"
+    ).format(t=FTS_TABLE)
+    params = [MARK_START, MARK_END, match]
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        sql += ' AND (bm25({t}) > %s OR (bm25({t}) = %s AND rowid > %s))'.format(t=FTS_TABLE)
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit + 1)
+
+    with using.cursor() as db:
+        db.execute(sql, params)
+        rows = db.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.select_related('author', 'group').in_bulk([row[0] for row in rows])
+    results = []
+    for pk, rank, snippet in rows:
+        if pk in posts:
+            post = posts[pk]
+            post.snippet = highlight(snippet)
+            results.append(post)
+    return results, next_cursor
+
+
+def search_posts_fallback(query, cursor=None, limit=10):
+    # без FTS5 остаётся полный просмотр таблицы, только новые сначала
+    posts = Post.objects.select_related('author', 'group').filter(text__icontains=query)
+    page = CursorPaginator(posts, limit).get_page(cursor)
+    for post in page:
+        post.snippet = escape(post.text)
+    return list(page), page.next_cursor
@@ -0,0 +1,171 @@
+import io
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from posts.lru import MISSING, LRUCache
+from posts.models import ImageVariant, Post
+from . import feed_cache, jobs, page_cache
+
+WIDTHS = getattr(settings, 'THUMBNAIL_WIDTHS', (320, 640, 1024))
+QUALITY = getattr(settings, 'THUMBNAIL_QUALITY', 80)
+# карточка поста показывает картинку в пропорции 4:3, как раньше 1024x768
+ASPECT = (4, 3)
+THUMBNAIL_DIR = 'thumbs/'
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+# варианты картинки не меняются, пока жив файл: имя исходника - хэш
+# содержимого. Поэтому кэшируются без сброса, только полные наборы
+variants_cache = LRUCache(getattr(settings, 'THUMBNAIL_VARIANTS_LRU_SIZE', 10000))
+
+
+def get_formats():
+    # WebP первым: браузер берёт первый подходящий <source>
+    if features.check('webp'):
+        return ['webp', 'jpeg']
+    return ['jpeg']
+
+
+def expected_variants():
+    return {(width, format) for width in WIDTHS for format in get_formats()}
+
+
+def variant_name(source, width, format):
+    root = os.path.splitext(source)[0]
+    return '{}{}_{}w.{}'.format(THUMBNAIL_DIR, root, width, EXTENSIONS[format])
+
+
+def generate(source):
+    """
+    Нарезает исходную картинку на все ширины из THUMBNAIL_WIDTHS в каждом
+    формате и сохраняет метаданные в ImageVariant. Возвращает список вариантов.
+    Строки пишутся одной транзакцией после всех файлов: читатель видит
+    либо весь набор, либо ничего.
+    """
+    with Post._meta.get_field('image').storage.open(source) as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    rows = []
+    for width in WIDTHS:
+        size = (width, width * ASPECT[1] // ASPECT[0])
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        for format in get_formats():
+            buffer = io.BytesIO()
+            output = resized.convert('RGB') if format == 'jpeg' else resized
+            output.save(buffer, format.upper(), quality=QUALITY)
+            name = variant_name(source, width, format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            rows.append((width, format, size[1], name))
+
+    variants = []
+    with transaction.atomic():
+        for width, format, height, name in rows:
+            variant, _ = ImageVariant.objects.update_or_create(
+                source=source, width=width, format=format,
+                defaults={'height': height, 'name': name})
+            variants.append(variant)
+    variants_cache.delete(source)
+    return variants
+
+
+def refresh_pages(source):
+    # страницы, закэшированные с исходной картинкой, перерисуются с srcset
+    for post in Post.objects.filter(image=source).only('id', 'author_id', 'group_id'):
+        page_cache.purge(*page_cache.post_tags(post))
+    feed_cache.bump_feed_version()
+
+
+def process(source):
+    # одинаковые загрузки лежат в одном файле - превью у них общие
+    if not ImageVariant.objects.filter(source=source).exists():
+        generate(source)
+    refresh_pages(source)
+
+
+def schedule(source):
+    """
+    Ставит нарезку превью в очередь задач. Задача видна воркерам после
+    коммита транзакции, в которой сохранён пост.
+    """
+    if source:
+        jobs.enqueue('thumbnails.generate', key='thumbnails:' + source, source=source)
+
+
+class Thumbnails:
+    """
+    Готовые превью одной картинки, сгруппированные по формату.
+    """
+
+    def __init__(self, variants):
+        self.formats = defaultdict(list)
+        for variant in sorted(variants, key=lambda v: v.width):
+            self.formats[variant.format].append(variant)
+
+    def srcset(self, format):
+        return ', '.join(
+            '{} {}w'.format(default_storage.url(variant.name), variant.width)
+            for variant in self.formats[format])
+
+    @property
+    def webp(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg(self):
+        return self.srcset('jpeg')
+
+    @property
+    def src(self):
+        largest = self.formats['jpeg'][-1]
+        return default_storage.url(largest.name)
+
+    def __bool__(self):
+        return bool(self.formats['jpeg'])
+
+
+def attach(posts):
+    """
+    Одним запросом подтягивает превью для постов страницы и кладёт их
+    в post.thumbnails. Уже встречавшиеся картинки берутся из LRU в памяти
+    процесса без запроса; неполный набор вариантов в LRU не попадает.
+    Принимает пост, список или страницу пагинатора.
+    """
+    if isinstance(posts, Post):
+        posts = [posts]
+    elif hasattr(posts, 'object_list'):
+        # страница потом обходится по тем же объектам, что получили превью
+        posts.object_list = list(posts.object_list)
+        posts = posts.object_list
+
+    sources = {post.image.name for post in posts if post.image}
+    variants = {}
+    misses = []
+    for source in sources:
+        cached = variants_cache.get(source)
+        if cached is MISSING:
+            misses.append(source)
+        else:
+            variants[source] = cached
+    if misses:
+        loaded = defaultdict(list)
+        for variant in ImageVariant.objects.filter(source__in=misses):
+            loaded[variant.source].append(variant)
+        expected = expected_variants()
+        for source, items in loaded.items():
+            if {(item.width, item.format) for item in items} >= expected:
+                variants_cache.set(source, items)
+            variants[source] = items
+    for post in posts:
+        if post.image and post.image.name in variants:
+            post.thumbnails = Thumbnails(variants[post.image.name])
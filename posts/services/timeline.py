@@ -0,0 +1,245 @@
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from posts.models import Follow, Post, TimelineEntry, UserStats
+from . import jobs
+from .paginator import OLDER, keyset_filter, keyset_ordering
+
+# сколько последних постов автора попадает в ленту при подписке
+BACKFILL_SIZE = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+FANOUT_BATCH_SIZE = getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+
+
+def _entry(user_id, post_id, author_id, pub_date):
+    return TimelineEntry(user_id=user_id, post_id=post_id,
+                         author_id=author_id, pub_date=pub_date)
+
+
+def fanout_limit():
+    # авторы с таким числом подписчиков читаются из ленты при чтении
+    return getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+def heavy_ttl():
+    return getattr(settings, 'TIMELINE_HEAVY_AUTHORS_TTL', 600)
+
+
+def heavy_author_ids():
+    """
+    Множество авторов, у которых подписчиков не меньше fanout_limit().
+    Читается по индексу UserStats.followers_count раз в
+    TIMELINE_HEAVY_AUTHORS_TTL секунд.
+    """
+    limit = fanout_limit()
+    key = 'timeline:heavy_authors:{}'.format(limit)
+    heavy = cache.get(key)
+    if heavy is None:
+        heavy = frozenset(UserStats.objects.filter(
+            followers_count__gte=limit).values_list('user_id', flat=True))
+        cache.set(key, heavy, heavy_ttl())
+    return heavy
+
+
+def unfollowed(author_id):
+    """
+    Если после отписки подписчиков у автора стало меньше fanout_limit(),
+    его посты снова раскладываются по лентам, а ленты подписчиков нужно
+    дозаполнить. Это делает задача timeline.demote - после того, как во
+    всех процессах истечёт кэш heavy_author_ids(): посты, которые до этого
+    не разложатся, она тоже добавит.
+    """
+    if UserStats.objects.filter(user_id=author_id, followers_count=fanout_limit() - 1).exists():
+        jobs.enqueue('timeline.demote', key='timeline.demote:{}'.format(author_id),
+                     delay=heavy_ttl(), author_id=author_id)
+
+
+def fan_out(post):
+    """
+    Раскладывает новый пост по лентам всех подписчиков автора.
+    Посты популярных авторов не раскладываются, их подмешивает follow_feed.
+    """
+    if post.author_id in heavy_author_ids():
+        return
+    follower_ids = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True).iterator()
+    batch = []
+    for user_id in follower_ids:
+        batch.append(_entry(user_id, post.pk, post.author_id, post.pub_date))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """
+    После подписки добавляет в ленту последние посты автора.
+    """
+    if author_id in heavy_author_ids():
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')[:BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [_entry(user_id, post_id, author_id, pub_date) for post_id, pub_date in posts],
+        ignore_conflicts=True)
+
+
+def backfill_followers(author_ids, using=connection):
+    """
+    Добавляет последние BACKFILL_SIZE постов каждого из авторов в ленты
+    всех их подписчиков одним INSERT ... SELECT. Популярные авторы
+    пропускаются. Возвращает число добавленных строк.
+    """
+    author_ids = list(UserStats.objects.filter(
+        user_id__in=author_ids, followers_count__lt=fanout_limit(),
+    ).values_list('user_id', flat=True))
+    if not author_ids:
+        return 0
+    sql = (
+        'INSERT {ignore} INTO {timeline} (user_id, post_id, author_id, pub_date) '
+        'SELECT f.user_id, p.id, p.author_id, p.pub_date FROM {follow} f '
+        'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+        'PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS n '
+        'FROM {post} WHERE author_id IN ({ids})) p ON p.author_id = f.author_id '
+        'WHERE p.n <= %s {conflict}'
+    ).format(
+        # в SQLite и PostgreSQL дубликаты отбрасываются по-разному
+        ignore='OR IGNORE' if using.vendor == 'sqlite' else '',
+        conflict='' if using.vendor == 'sqlite' else 'ON CONFLICT DO NOTHING',
+        timeline=TimelineEntry._meta.db_table, follow=Follow._meta.db_table,
+        post=Post._meta.db_table, ids=', '.join(['%s'] * len(author_ids)))
+    with using.cursor() as cursor:
+        cursor.execute(sql, author_ids + [BACKFILL_SIZE])
+        return cursor.rowcount
+
+
+def demote(author_id):
+    # автор мог снова набрать подписчиков, пока задача ждала
+    return backfill_followers([author_id])
+
+
+def trim(user_id, author_id):
+    """
+    После отписки убирает посты автора из ленты.
+    """
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class TimelineFeed:
+    """
+    Лента подписок пользователя, прочитанная из TimelineEntry.
+
+    Отдаёт посты и подходит обоим пагинаторам: Paginator'у нужны
+    count() и срезы, CursorPaginator'у - keyset().
+    """
+    keys = ('pub_date', 'post_id')
+
+    def __init__(self, user):
+        self.entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group')
+
+    def count(self, limit=None):
+        entries = self.entries if limit is None else self.entries[:limit]
+        return entries.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        entries = self.entries.order_by(*keyset_ordering(self.keys))
+        if isinstance(index, slice):
+            return [entry.post for entry in entries[index]]
+        return entries[index].post
+
+    def keyset(self, value, direction, limit):
+        entries = self.entries
+        if value is not None:
+            entries = entries.filter(keyset_filter(self.keys, value, direction))
+        entries = entries.order_by(*keyset_ordering(self.keys, direction))
+        return [entry.post for entry in entries[:limit]]
+
+
+class PostFeed:
+    """
+    Обычный QuerySet постов с тем же интерфейсом, что у TimelineFeed.
+    """
+    keys = ('pub_date', 'id')
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def count(self, limit=None):
+        queryset = self.queryset if limit is None else self.queryset[:limit]
+        return queryset.count()
+
+    def __getitem__(self, index):
+        return self.queryset.order_by(*keyset_ordering(self.keys))[index]
+
+    def keyset(self, value, direction, limit):
+        queryset = self.queryset
+        if value is not None:
+            queryset = queryset.filter(keyset_filter(self.keys, value, direction))
+        return list(queryset.order_by(*keyset_ordering(self.keys, direction))[:limit])
+
+
+def _sort_key(post):
+    return post.pub_date, post.pk
+
+
+def _merge(sources, reverse):
+    seen = set()
+    for post in heapq.merge(*sources, key=_sort_key, reverse=reverse):
+        if post.pk not in seen:
+            seen.add(post.pk)
+            yield post
+
+
+class MergedFeed:
+    """
+    k-путевое слияние нескольких лент по (pub_date, id) без повторов.
+    Каждый источник читается не дальше нужной страницы.
+    """
+
+    def __init__(self, *feeds):
+        self.feeds = feeds
+
+    def count(self, limit=None):
+        total = sum(feed.count(limit) for feed in self.feeds)
+        return total if limit is None else min(total, limit)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = index.stop
+        merged = _merge([feed[:stop] for feed in self.feeds], reverse=True)
+        return list(merged)[index]
+
+    def keyset(self, value, direction, limit):
+        sources = [feed.keyset(value, direction, limit) for feed in self.feeds]
+        merged = _merge(sources, reverse=direction == OLDER)
+        return [post for post, _ in zip(merged, range(limit))]
+
+
+def follow_feed(user):
+    """
+    Лента подписок: материализованная часть плюс свежие посты
+    популярных авторов, которые при публикации не раскладывались.
+    """
+    feed = TimelineFeed(user)
+    heavy = heavy_author_ids()
+    if not heavy:
+        return feed
+    author_ids = Follow.objects.filter(user=user, author_id__in=heavy).values_list(
+        'author_id', flat=True)
+    posts = Post.objects.select_related('author', 'group')
+    pulled = [PostFeed(posts.filter(author_id=author_id)) for author_id in author_ids]
+    if not pulled:
+        return feed
+    return MergedFeed(feed, *pulled)
@@ -0,0 +1,122 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import connections
+from django.dispatch import receiver
+
+from . import db
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .services import (autocomplete, counters, feed_cache, media, notifications,
+                       page_cache, search, timeline)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+        autocomplete.index.add_user(instance.username)
+    elif not update_fields or 'username' in update_fields:
+        # вход обновляет только last_login - индекс не трогаем
+        autocomplete.index.invalidate()
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # при смене группы нужно сбросить и страницу прежней группы,
+    # при смене картинки - снять ссылку на прежний файл
+    if instance.pk:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if previous:
+            instance._previous_group_id, instance._previous_image = previous
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    feed_cache.bump_feed_version()
+    page_cache.purge(*page_cache.post_tags(
+        instance, getattr(instance, '_previous_group_id', None)))
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        notifications.schedule(instance)
+    previous_image = getattr(instance, '_previous_image', None)
+    if instance.image.name != previous_image:
+        media.retain(instance.image.name)
+        media.release(previous_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    feed_cache.bump_feed_version()
+    page_cache.purge(*page_cache.post_tags(instance))
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    page_cache.purge('author:{}'.format(instance.author_id),
+                     'author:{}'.format(instance.user_id))
+    if created:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    page_cache.purge('author:{}'.format(instance.author_id),
+                     'author:{}'.format(instance.user_id))
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.unfollowed(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    feed_cache.bump_feed_version()
+    page_cache.purge(*page_cache.post_tags(instance.post))
+    if created:
+        counters.change_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    feed_cache.bump_feed_version()
+    tags = ['feed', 'post:{}'.format(instance.post_id)]
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post:
+        tags.append('author:{}'.format(post[0]))
+        if post[1]:
+            tags.append('group:{}'.format(post[1]))
+    page_cache.purge(*tags)
+    counters.change_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    feed_cache.bump_feed_version()
+    page_cache.purge('feed', 'group:{}'.format(instance.pk))
+    if created:
+        autocomplete.index.add_group(instance.slug, instance.title)
+    else:
+        autocomplete.index.invalidate()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    page_cache.purge('author:{}'.format(instance.pk))
+    autocomplete.index.invalidate()
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    db.apply_pragmas(connection)
+
+
+def install_search_index(using, **kwargs):
+    # триггеры FTS пропадают, если миграция пересоздала posts_post
+    search.install_index(connections[using])
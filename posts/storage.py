@@ -0,0 +1,69 @@
+import hashlib
+import os
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла - sha256 его содержимого:
+    posts/ab/cd/abcd....jpg. Одинаковые загрузки ложатся в один файл,
+    поэтому и превью у них общие. Файл удаляется по счётчику ссылок
+    MediaBlob (posts.services.media), а не вместе с постом.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # совпадение имени означает совпадение содержимого
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.touch(name):
+            return name
+        return super()._save(name, content)
+
+    def touch(self, name):
+        """
+        Отмечает повторную загрузку временем изменения файла. Проверка и
+        отметка - один системный вызов, поэтому delete_unused() либо
+        увидит отметку, либо файла уже не будет и загрузка запишет его
+        заново.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete_unused(self, name, grace):
+        """
+        Удаляет файл, если его не загружали заново последние grace секунд.
+        Файл сначала убирается из-под своего имени, а потом проверяется
+        время изменения: загрузка, отметившая его до этого, вернёт файл
+        на место. Возвращает False, если файл ещё может быть нужен.
+        """
+        path = self.path(name)
+        removed = path + '.removed'
+        try:
+            os.rename(path, removed)
+        except FileNotFoundError:
+            return True
+        if time.time() - os.path.getmtime(removed) < grace:
+            # загрузка после переименования могла записать тот же файл заново
+            os.replace(removed, path)
+            return False
+        os.remove(removed)
+        return True
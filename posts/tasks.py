@@ -0,0 +1,44 @@
+"""
+Задачи фоновой очереди. Модуль импортируется в PostsConfig.ready(),
+чтобы и веб-процессы, и воркеры run_workers знали все задачи.
+"""
+from django.core import mail
+
+from .services import counters, jobs, media, notifications, thumbnails, timeline
+
+
+@jobs.task('thumbnails.generate', priority=5)
+def generate_thumbnails(source):
+    thumbnails.process(source)
+
+
+@jobs.task('media.collect', priority=-5)
+def collect_media(source):
+    media.collect(source)
+
+
+@jobs.task('notifications.new_posts')
+def notify_followers(author_id, start, end):
+    notifications.split_followers(author_id, start, end)
+
+
+@jobs.task('notifications.send_batch', max_attempts=8)
+def send_notifications(author_id, post_ids, first_id, last_id):
+    notifications.send_batch(author_id, post_ids, first_id, last_id)
+
+
+@jobs.task('mail.send', max_attempts=8)
+def send_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    mail.send_mail(subject, message, from_email, recipient_list, html_message=html_message)
+
+
+@jobs.task('timeline.demote')
+def demote_author(author_id):
+    timeline.demote(author_id)
+
+
+@jobs.task('counters.reconcile', priority=-10, max_attempts=1)
+def reconcile_counters(batch_size=1000):
+    counters.reconcile_comment_counts(batch_size)
+    counters.reconcile_user_stats(batch_size)
+    media.reconcile_refcounts()
@@ -0,0 +1,12 @@
+from django import template
+
+from posts.services import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    # ставится перед циклом по постам, внутри {% cache %}, если он есть
+    thumbnails.attach(posts)
+    return ''
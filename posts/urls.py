@@ -1,17 +1,29 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, views
+
+# под ASGI ленты отдаются асинхронными версиями страниц
+feed_views = async_views if settings.ASYNC_FEED_VIEWS else views
 
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug>/', views.group_posts, name='group_posts'),
+    path('', feed_views.index, name='index'),
+    path('group/<slug>/', feed_views.group_posts, name='group_posts'),
     path('new/', views.new_post, name='new_post'),
-    path('follow/', views.follow_index, name='follow_index'),
-    path('<username>/', views.profile, name='profile'),
-    path('<username>/<int:post_id>/', views.post_view, name='post'),
+    path('follow/', feed_views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete_lookup, name='autocomplete'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug>/', api.group_posts, name='api_group_posts'),
+    path('api/users/<username>/', api.profile, name='api_profile'),
+    path('<username>/', feed_views.profile, name='profile'),
+    path('<username>/<int:post_id>/', feed_views.post_view, name='post'),
+    path('<username>/<int:post_id>/comments/',
+         feed_views.post_comments, name='post_comments'),
     path('<username>/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('<username>/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('<username>/export/', feed_views.export_posts, name='export_posts'),
     path('<username>/follow', views.profile_follow, name='profile_follow'),
     path('<username>/unfollow', views.profile_unfollow, name='profile_unfollow'),
 ]
@@ -1,3 +1,5 @@
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from .services import post_request
@@ -5,18 +7,37 @@ from .models import Post, Comment, Follow
 from posts.models import User
 from .forms import PostForm, CommentForm
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.contrib.auth.views import redirect_to_login
+from .services.paginator import paginate
+from .services.timeline import follow_feed
+from .services.counters import get_stats
+from .services import (autocomplete, export, freshness, notifications, page_cache,
+                       replicas, thumbnails)
 from django.views.decorators.cache import cache_page
 from django.views.decorators.http import require_POST
 
 
+@replicas.read_only
 def index(request):
+    page_cache.tag(request, 'feed')
     return render(request, 'index.html', post_request.get_latest_posts(request, 10))
 
 
+@replicas.read_only
 def group_posts(request, slug):
-    print('request for group {}'.format(slug))
-    return render(request, 'group.html', post_request.get_page_setup(request, slug))
+    context = post_request.get_page_setup(request, slug)
+    page_cache.tag(request, 'group:{}'.format(context['group'].pk))
+    return render(request, 'group.html', context)
+
+
+@replicas.read_only
+def search(request):
+    return render(request, 'search.html', post_request.search_keyword(request))
+
+
+def autocomplete_lookup(request):
+    # ответ из индекса в памяти процесса, без запросов к базе
+    return JsonResponse(autocomplete.index.find(request.GET.get('q', '')))
 
 
 @login_required
@@ -27,6 +48,8 @@ def new_post(request):
             new_post = form.save(commit=False)
             new_post.author = request.user
             new_post.save()
+            if new_post.image:
+                thumbnails.schedule(new_post.image.name)
 
             return redirect('index')
 
@@ -49,18 +72,29 @@ def add_comment(request, username, post_id):
         return redirect('post', username, post_id)
 
 
+@replicas.read_only
+@freshness.conditional(freshness.profile_state, per_user=True)
 def profile(request, username):
-    return render(request, 'profile.html', post_request.get_user_info(request, username))
+    context = post_request.get_user_info(request, username)
+    page_cache.tag(request, 'author:{}'.format(context['profile'].pk))
+    return render(request, 'profile.html', context)
 
 
+@replicas.read_only
+@freshness.conditional(freshness.post_state, per_user=True)
 def post_view(request, username, post_id):
-    user = get_object_or_404(User, username__exact=username)
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    user = get_object_or_404(User.objects.select_related('stats'), username__exact=username)
+    get_stats(user)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    # первая порция комментариев, остальные подгружает post_comments
+    comments, next_cursor = post_request.get_first_comments(post)
     comment_form = CommentForm()
+    page_cache.tag(request, 'post:{}'.format(post.pk), 'author:{}'.format(user.pk))
     context = {
         'form': comment_form,
         'items': comments,
+        'next_cursor': next_cursor,
         'post_view': user,
         'post': post,
     }
@@ -68,6 +102,21 @@ def post_view(request, username, post_id):
     return render(request, 'post.html', context)
 
 
+@replicas.read_only
+def post_comments(request, username, post_id):
+    # следующая порция комментариев - HTML-фрагмент для кнопки «Показать ещё»
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id, author__username=username)
+    page_cache.tag(request, 'post:{}'.format(post.pk))
+    comments = post_request.get_comments(post.pk, request.GET.get('cursor'))
+    context = {
+        'items': comments,
+        'next_cursor': comments.next_cursor,
+        'post': post,
+        'username': username,
+    }
+    return render(request, 'comment_list.html', context)
+
+
 @login_required
 def post_edit(request, username, post_id):
     user_profile = get_object_or_404(User, username__exact=username)
@@ -78,7 +127,9 @@ def post_edit(request, username, post_id):
                     files=request.FILES or None, instance=post)
     if request.method == 'POST':
         if form.is_valid():
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data and post.image:
+                thumbnails.schedule(post.image.name)
             return redirect('post', username, post_id)
 
     content = {
@@ -90,6 +141,33 @@ def post_edit(request, username, post_id):
     return render(request, 'post_new.html', content)
 
 
+def export_response(request, username, chunks):
+    """
+    Ответ с выгрузкой; chunks(Export) - итератор её кусков: синхронный
+    для WSGI или асинхронный для posts.async_views.
+    """
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    # выгрузка для самого автора и для сотрудников (запросы комплаенса)
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    format = request.GET.get('format', 'ndjson')
+    if format not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    compress = request.GET.get('gzip') == '1'
+    content_type = 'application/gzip' if compress else export.FORMATS[format] + '; charset=utf-8'
+    response = StreamingHttpResponse(
+        chunks(export.Export(author, format, compress)), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        export.filename(author, format, compress))
+    return response
+
+
+def export_posts(request, username):
+    return export_response(request, username, export.Export.chunks)
+
+
 def page_not_found(request, exception):
     return render(request, "misc/404.html", {"path": request.path}, status=404)
 
@@ -102,11 +180,10 @@ def server_error(request):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__in=request.user.tracking.all()).order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    # лента разложена по подписчикам в TimelineEntry, посты популярных
+    # авторов подмешиваются при чтении
+    paginator, page = paginate(request, follow_feed(request.user), 10)
+    notifications.mark_read(request.user)
     return render(request, "follow.html", {'page': page, 'paginator': paginator, })
 
 
@@ -115,6 +192,7 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
         Follow.objects.get_or_create(user=request.user, author=author)
+    replicas.pin(request)
     return redirect('profile', author)
 
 
@@ -122,4 +200,5 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
+    replicas.pin(request)
     return redirect('profile', author)
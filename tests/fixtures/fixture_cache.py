@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # страницы кэшируются по URL, а база между тестами пересоздаётся
+    from django.core.cache import caches
+    from posts.services import thumbnails
+    for cache in caches.all():
+        cache.clear()
+    thumbnails.variants_cache.clear()
@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # загруженные картинки и превью не должны попадать в media/ проекта,
+    # а картинки и фоновые задачи обрабатываются сразу, чтобы тест видел результат
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.JOBS_RUN_INLINE = True
+    settings.IMAGE_INGEST_WORKERS = 0
+    settings.MEDIA_COLLECT_GRACE = 0
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from tests.test_conditional_get import settle
+
+
+@pytest.fixture
+def posts(user, group):
+    return [
+        Post.objects.create(text=f'Пост {i}', author=user, group=group) for i in range(5)
+    ]
+
+
+def get_json(client, url, **headers):
+    response = client.get(url, **headers)
+    assert response.status_code == 200
+    return response, json.loads(response.content)
+
+
+class TestFeedApi:
+
+    @pytest.mark.django_db
+    def test_feeds_paginated_by_cursor(self, client, user, group, posts):
+        urls = [
+            reverse('api_index'),
+            reverse('api_group_posts', args=[group.slug]),
+            reverse('api_profile', args=[user.username]),
+        ]
+        for url in urls:
+            response, data = get_json(client, url + '?limit=3')
+            assert b', ' not in response.content and 'Пост'.encode() in response.content, \
+                'Проверьте, что API отдаёт компактный JSON без \\u-экранирования'
+            ids = [post['id'] for post in data['posts']]
+            _, data = get_json(client, url + '?limit=3&cursor=' + data['next_cursor'])
+            ids += [post['id'] for post in data['posts']]
+            assert ids == [post.id for post in reversed(posts)], \
+                f'Проверьте, что `{url}` листается курсором без пропусков и повторов'
+            assert data['next_cursor'] is None
+
+        _, data = get_json(client, urls[2])
+        assert data['profile']['posts_count'] == 5, \
+            'Проверьте, что API профиля отдаёт счётчики автора'
+
+    @pytest.mark.django_db
+    def test_not_modified_without_loading_posts(self, client, user, group, posts):
+        settle()
+        for url in (reverse('api_index'), reverse('api_group_posts', args=[group.slug]),
+                    reverse('api_profile', args=[user.username])):
+            response, _ = get_json(client, url)
+            assert response['Cache-Control'] and response['Last-Modified']
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            assert response.status_code == 304, \
+                f'Проверьте, что `{url}` отвечает 304 на совпавший ETag'
+            assert len(context.captured_queries) == 1, \
+                'Проверьте, что для 304 хватает одного запроса, без загрузки постов'
+            response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            assert response.status_code == 304, \
+                f'Проверьте, что `{url}` отвечает 304 на If-Modified-Since'
+
+    @pytest.mark.django_db
+    def test_validators_change_with_feed(self, client, user, posts):
+        url = reverse('api_profile', args=[user.username])
+        response, _ = get_json(client, url)
+        etag = response['ETag']
+
+        posts[0].text = 'Исправленный пост'
+        posts[0].save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Проверьте, что правка поста меняет ETag ленты'
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1970 00:00:00 GMT')
+        assert response.status_code == 200, \
+            'Проверьте, что изменённая после If-Modified-Since лента отдаётся целиком'
+
+    @pytest.mark.django_db
+    def test_unknown_profile(self, client):
+        assert client.get(reverse('api_profile', args=['nobody'])).status_code == 404
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from posts import async_views
+from posts.middleware import AnonymousPageCacheMiddleware
+from posts.services import blocking
+
+
+def get(path, user=None):
+    request = RequestFactory().get(path)
+    request.user = user or AnonymousUser()
+    return request
+
+
+class TestAsyncViews:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_render(self, user, post_with_group):
+        group = post_with_group.group
+        pages = [
+            async_views.index(get('/')),
+            async_views.group_posts(get(f'/group/{group.slug}/'), group.slug),
+            async_views.profile(get(f'/{user.username}/'), user.username),
+            async_views.post_view(get(f'/{user.username}/{post_with_group.id}/'),
+                                  user.username, post_with_group.id),
+            async_views.follow_index(get('/follow/', user)),
+        ]
+
+        async def render_all():
+            return await asyncio.gather(*pages)
+
+        responses = asyncio.run(render_all())
+        for response in responses:
+            assert response.status_code == 200, \
+                'Проверьте, что асинхронные страницы лент отдают те же ответы'
+        for response in responses[:4]:
+            assert post_with_group.text in response.content.decode()
+
+    def test_pool_is_bounded(self, settings, monkeypatch):
+        settings.ASYNC_POOL_WORKERS = 2
+        monkeypatch.setattr(blocking, '_executor', None)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+        async def run_all():
+            await asyncio.gather(*[blocking.run(work) for _ in range(6)])
+
+        asyncio.run(run_all())
+        blocking.get_executor().shutdown()
+        assert max(peak) == 2, 'Проверьте, что пул ограничен ASYNC_POOL_WORKERS потоками'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_page_cache_async(self):
+        calls = []
+
+        async def view(request):
+            calls.append(request)
+            request.surrogate_keys = {'feed'}
+            return HttpResponse('страница')
+
+        middleware = AnonymousPageCacheMiddleware(view)
+        assert iscoroutinefunction(middleware)
+
+        async def twice():
+            await middleware(get('/async-page/'))
+            return await middleware(get('/async-page/'))
+
+        response = asyncio.run(twice())
+        assert response.content.decode() == 'страница' and len(calls) == 1, \
+            'Проверьте, что кэш страниц работает и в асинхронной цепочке'
@@ -0,0 +1,45 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from posts.models import Group
+from posts.services.autocomplete import VERSION_KEY, Autocomplete, PrefixIndex
+
+
+class TestAutocomplete:
+
+    def test_prefix_index(self):
+        index = PrefixIndex([('anna', 'Anna'), ('andrey', 'Andrey'), ('boris', 'Boris')])
+        index.add('anton', 'Anton')
+        assert index.find('an') == ['Andrey', 'Anna', 'Anton']
+        assert index.find('an', limit=1) == ['Andrey']
+        assert index.find('z') == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_autocomplete_view(self, client, user, django_assert_num_queries):
+        Group.objects.create(title='Тестировщики', slug='qa', description='Группа')
+        client.get('/autocomplete/', {'q': 'x'})
+        get_user_model().objects.create_user(username='TestUser2')
+        Group.objects.create(title='Test drive', slug='drive', description='Группа')
+
+        with django_assert_num_queries(0):
+            response = client.get('/autocomplete/', {'q': 'test'})
+        assert response.json() == {
+            'users': ['TestUser', 'TestUser2'],
+            'groups': [{'slug': 'drive', 'title': 'Test drive'}],
+        }, 'Проверьте, что новые пользователи и группы сразу попадают в подсказки'
+        assert client.get('/autocomplete/', {'q': 'тест'}).json()['groups'] == \
+            [{'slug': 'qa', 'title': 'Тестировщики'}]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_version_bumped_after_commit(self):
+        # индекс другого процесса
+        other = Autocomplete()
+        other.find('x')
+        with transaction.atomic():
+            get_user_model().objects.create_user(username='Committed')
+            assert cache.get(VERSION_KEY) == other.version, \
+                'Проверьте, что версия индекса меняется только после коммита'
+        assert other.find('comm')['users'] == ['Committed'], \
+            'Проверьте, что другие процессы видят нового пользователя после коммита'
@@ -0,0 +1,66 @@
+import gzip
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Follow, Group, Post, TimelineEntry, User, UserStats
+from posts.services import bulk_import
+from tests.test_search import indexed_ids
+
+
+def records(user):
+    yield {'type': 'group', 'slug': 'imported', 'title': 'Импорт'}
+    yield {'type': 'user', 'username': 'writer'}
+    for i in range(5):
+        yield {'type': 'post', 'author': 'writer', 'group': 'imported',
+               'text': f'Импортированный пост {i}', 'pub_date': f'2020-01-0{i + 1}T12:00:00'}
+    yield {'type': 'post', 'author': 'nobody', 'text': 'Автора нет'}
+    yield {'type': 'post', 'author': 'writer', 'text': 'Нет такой даты', 'pub_date': '2020-13-40T00:00'}
+    yield {'type': 'follow', 'user': user.username, 'author': 'writer'}
+    yield {'type': 'follow', 'user': user.username, 'author': 'writer'}
+
+
+class TestBulkImport:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_and_sync(self, user):
+        importer = bulk_import.Importer(batch_size=2)
+        counts = importer.run(records(user))
+        assert (counts['group'], counts['user'], counts['post']) == (1, 1, 5), \
+            'Проверьте, что загружаются группы, пользователи и посты'
+        assert counts['skipped'] == 2, \
+            'Проверьте, что посты с неизвестным автором и несуществующей датой пропускаются'
+        writer = User.objects.get(username='writer')
+        group = Group.objects.get(slug='imported')
+        posts = Post.objects.filter(author=writer, group=group)
+        assert posts.count() == 5 and posts.earliest('pub_date').pub_date.year == 2020, \
+            'Проверьте, что посты связаны с автором и группой и сохраняют даты из файла'
+        assert Follow.objects.filter(user=user, author=writer).count() == 1, \
+            'Проверьте, что повторная подписка не создаёт дубликат'
+        assert indexed_ids('импортированный') == set(posts.values_list('id', flat=True)), \
+            'Проверьте, что загруженные посты попадают в поисковый индекс'
+
+        with CaptureQueriesContext(connection) as context:
+            importer.sync()
+        inserts = [q for q in context.captured_queries
+                   if 'INTO posts_timelineentry' in q['sql'].replace('"', '')]
+        assert len(inserts) == 1, \
+            'Проверьте, что ленты подписчиков дозаполняются одним запросом на пачку авторов'
+        assert UserStats.objects.get(user=writer).posts_count == 5, \
+            'Проверьте, что счётчики профиля пересчитываются после загрузки'
+        assert TimelineEntry.objects.filter(user=user, author=writer).count() == 5, \
+            'Проверьте, что посты попадают в ленту подписчика'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_command(self, user, tmp_path, capsys):
+        path = tmp_path / 'import.ndjson.gz'
+        lines = [json.dumps(record, ensure_ascii=False) for record in records(user)]
+        path.write_bytes(gzip.compress('\n'.join(lines + ['{битая строка']).encode()))
+        call_command('bulk_import', str(path), '--batch-size', '3')
+        output = capsys.readouterr().out
+        assert '5 постов' in output and 'нечитаемых строк: 1' in output and 'строк/с' in output, \
+            'Проверьте, что команда bulk_import сообщает итоги и скорость загрузки'
+        assert UserStats.objects.get(user__username='writer').followers_count == 1
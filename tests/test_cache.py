@@ -0,0 +1,102 @@
+import pytest
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client
+
+from posts.models import Comment, Post
+from posts.services import page_cache
+
+
+class TestIndexCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_cached_separately(self, client, user):
+        for i in range(15):
+            Post.objects.create(text=f'Пост номер {i}', author=user)
+        first = client.get('/').content.decode()
+        second = client.get('/?page=2').content.decode()
+        assert 'Пост номер 14' in first and 'Пост номер 14' not in second, \
+            'Проверьте, что кэш главной страницы учитывает номер страницы'
+        assert 'Пост номер 0' in second
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_visible_immediately(self, client, user, post):
+        client.get('/')
+        Post.objects.create(text='Свежий пост 5678', author=user)
+        assert 'Свежий пост 5678' in client.get('/').content.decode(), \
+            'Проверьте, что новый пост сразу сбрасывает кэш главной страницы'
+
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        assert '1 комментариев' in client.get('/').content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_auth_state_in_key(self, user_client, post):
+        assert 'Редактировать' in user_client.get('/').content.decode()
+        assert 'Редактировать' not in Client().get('/').content.decode(), \
+            'Проверьте, что анонимный пользователь не получает фрагмент автора'
+
+
+class TestAnonymousPageCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_hit_without_queries(self, client, post, django_assert_num_queries):
+        url = f'/{post.author.username}/{post.id}/'
+        client.get(url)
+        with django_assert_num_queries(0):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert post.text in response.content.decode(), \
+            'Проверьте, что анонимная страница поста отдаётся из кэша без запросов к базе'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_purge_by_surrogate_keys(self, client, user, post_with_group):
+        group_url = f'/group/{post_with_group.group.slug}/'
+        profile_url = f'/{user.username}/'
+        client.get(group_url)
+        client.get(profile_url)
+        client.get('/')
+
+        Post.objects.create(text='Новый пост в группе', author=user, group=post_with_group.group)
+        for url in (group_url, profile_url, '/'):
+            assert 'Новый пост в группе' in client.get(url).content.decode(), \
+                f'Проверьте, что новый пост сбрасывает кэш страницы `{url}`'
+
+        post_url = f'/{user.username}/{post_with_group.id}/'
+        client.get(post_url)
+        Comment.objects.create(post=post_with_group, author=user, text='Комментарий 4321')
+        assert 'Комментарий 4321' in client.get(post_url).content.decode(), \
+            'Проверьте, что комментарий сбрасывает кэш страницы поста'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_logged_in_not_cached(self, user_client, post):
+        url = f'/{post.author.username}/'
+        user_client.get(url)
+        assert user_client.get(url).context is not None, \
+            'Проверьте, что страницы авторизованных пользователей не берутся из кэша'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_purge_without_shared_page_list(self):
+        started = page_cache.clock()
+        page_cache.store('page:a', 'A', ['feed', 'group:1'], started)
+        page_cache.store('page:b', 'B', ['feed'], started)
+        page_cache.purge('group:1')
+        assert (page_cache.fetch('page:a'), page_cache.fetch('page:b')) == (None, 'B'), \
+            'Проверьте, что сброс ключа снимает только помеченные им страницы'
+        page_cache.purge('feed')
+        assert page_cache.fetch('page:b') is None
+
+        page_cache.store('page:c', 'C', ['feed'], page_cache.clock())
+        cache.delete(page_cache.GENERATION_PREFIX + 'feed')
+        assert page_cache.fetch('page:c') is None, \
+            'Проверьте, что страница с вытесненным поколением ключа не отдаётся'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_purge_during_render(self):
+        started = page_cache.clock()
+        with transaction.atomic():
+            page_cache.purge('feed')
+            page_cache.store('page:a', 'A', ['feed'], started)
+        assert page_cache.fetch('page:a') is None, \
+            'Проверьте, что кэш сбрасывается после коммита, а не до него'
+        assert not page_cache.store('page:b', 'B', ['feed'], started), \
+            'Проверьте, что страница, во время рендеринга которой был сброс, не кэшируется'
@@ -0,0 +1,62 @@
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment
+
+
+@pytest.fixture
+def comments(post, django_user_model):
+    authors = [
+        django_user_model.objects.create_user(username=f'Commenter{i}') for i in range(3)
+    ]
+    return [
+        Comment.objects.create(post=post, author=authors[i % 3], text=f'Комментарий {i}')
+        for i in range(7)
+    ]
+
+
+def shown(html):
+    return [int(pk) for pk in re.findall(r'name="comment_(\d+)"', html)]
+
+
+def more_link(html):
+    found = re.search(r'class="[^"]*comments-more"\s+href="([^"]+)"', html)
+    return found.group(1).replace('&amp;', '&') if found else None
+
+
+class TestCommentPages:
+
+    @pytest.mark.django_db
+    def test_comments_loaded_in_chunks(self, client, settings, post, comments):
+        settings.COMMENTS_PAGE_SIZE = 3
+        html = client.get(reverse('post', args=[post.author.username, post.id])).content.decode()
+        seen = shown(html)
+        assert len(seen) == 3, 'Проверьте, что на странице поста только первая порция комментариев'
+
+        link = more_link(html)
+        while link:
+            html = client.get(link).content.decode()
+            seen += shown(html)
+            link = more_link(html)
+        assert seen == [comment.id for comment in reversed(comments)], \
+            'Проверьте, что порции комментариев идут от новых к старым без пропусков и повторов'
+
+    @pytest.mark.django_db
+    def test_chunk_queries_do_not_grow(self, client, settings, post, comments):
+        settings.COMMENTS_PAGE_SIZE = 5
+        url = reverse('post_comments', args=[post.author.username, post.id])
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert len(shown(response.content.decode())) == 5
+        assert len(context.captured_queries) == 2, \
+            'Проверьте, что порция комментариев вместе с авторами загружается одним запросом'
+
+    @pytest.mark.django_db
+    def test_chunk_of_unknown_post(self, client, post):
+        url = reverse('post_comments', args=['nobody', post.id])
+        assert client.get(url).status_code == 404, \
+            'Проверьте, что комментарии чужого или несуществующего поста отдают 404'
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post, Revision
+from posts.services import page_cache
+
+
+def pages(post):
+    return [
+        reverse('post', args=[post.author.username, post.id]),
+        reverse('profile', args=[post.author.username]),
+    ]
+
+
+def settle():
+    # Last-Modified отдаётся, когда секунда последнего изменения прошла:
+    # переносим изменения на минуту назад
+    Post.objects.update(pub_date=F('pub_date') - timedelta(minutes=1))
+    Revision.objects.update(changed=F('changed') - timedelta(minutes=1))
+
+
+class TestConditionalGet:
+
+    @pytest.mark.django_db
+    def test_anonymous_not_modified(self, client, post):
+        settle()
+        for url in pages(post):
+            response = client.get(url)
+            assert response['ETag'] and response['Last-Modified'], \
+                f'Проверьте, что `{url}` отдаёт ETag и Last-Modified'
+            assert 'public' in response['Cache-Control'], \
+                'Проверьте, что страницу анонимного читателя можно хранить в общих кэшах'
+
+            # из полностраничного кэша и из самого представления
+            assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+            cache.delete(page_cache.page_key(RequestFactory().get(url)))
+            with CaptureQueriesContext(connection) as context:
+                not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            assert not_modified.status_code == 304, \
+                f'Проверьте, что `{url}` отвечает 304 на совпавший ETag'
+            assert len(context.captured_queries) == 1, \
+                'Проверьте, что валидатор считается одним запросом до остальной работы'
+            assert client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comment_changes_validator(self, client, user, post):
+        url = pages(post)[0]
+        etag = client.get(url)['ETag']
+        Comment.objects.create(post=post, author=user, text='Новый комментарий')
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200, \
+            'Проверьте, что новый комментарий меняет ETag страницы поста'
+
+    @pytest.mark.django_db
+    def test_csrf_rotation_changes_validator(self, settings, user_client, post):
+        url = pages(post)[0]
+        # первая страница выдаёт cookie CSRF, с ней считается ETag
+        user_client.get(url)
+        etag = user_client.get(url)['ETag']
+        assert user_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        # вход меняет токен CSRF
+        user_client.cookies[settings.CSRF_COOKIE_NAME] = get_token(RequestFactory().get(url))
+        assert user_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200, \
+            'Проверьте, что после смены токена CSRF страница с формой не отдаётся как 304'
+
+    @pytest.mark.django_db
+    def test_logged_in_validator_per_user(self, user_client, post):
+        for url in pages(post):
+            # ETag считается с cookie CSRF, которую выдаёт первая страница
+            user_client.get(url)
+            response = user_client.get(url)
+            assert 'private' in response['Cache-Control'], \
+                'Проверьте, что страница вошедшего пользователя не попадает в общие кэши'
+            assert response['ETag'] != Client().get(url)['ETag'], \
+                'Проверьте, что ETag страницы зависит от читателя'
+            assert user_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    @pytest.mark.django_db
+    def test_validator_shared_between_processes(self, client, user, post):
+        url = pages(post)[0]
+        etag = client.get(url)['ETag']
+        # комментарий пришёл в другой процесс: здешний кэш о нём не знает
+        with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            Comment.objects.create(post=post, author=user, text='Комментарий из другого процесса')
+        cache.delete(page_cache.page_key(RequestFactory().get(url)))
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200, \
+            'Проверьте, что валидатор строится по базе, а не по кэшу процесса'
+
+    @pytest.mark.django_db
+    def test_no_last_modified_in_same_second(self, client, post):
+        response = client.get(pages(post)[0])
+        assert response['ETag'] and not response.has_header('Last-Modified'), \
+            'Проверьте, что Last-Modified не отдаётся, пока не прошла секунда изменения'
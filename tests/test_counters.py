@@ -0,0 +1,59 @@
+import pytest
+from django.core.management import call_command
+
+from posts.models import Comment, Post
+
+
+class TestCommentCount:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comment_count_follows_comments(self, user_client, post):
+        url = f'/{post.author.username}/{post.id}/comment/'
+        user_client.post(url, data={'text': 'Первый'})
+        user_client.post(url, data={'text': 'Второй'})
+        post.refresh_from_db()
+        assert post.comment_count == 2, \
+            'Проверьте, что добавление комментария увеличивает `comment_count` поста'
+
+        Comment.objects.filter(text='Первый').delete()
+        post.refresh_from_db()
+        assert post.comment_count == 1, \
+            'Проверьте, что удаление комментария уменьшает `comment_count` поста'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reconcile_counters(self, user, post):
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        Post.objects.filter(pk=post.pk).update(comment_count=7)
+        call_command('reconcile_counters', batch_size=1)
+        post.refresh_from_db()
+        assert post.comment_count == 1, \
+            'Проверьте, что reconcile_counters исправляет разошедшиеся счётчики'
+
+
+class TestUserStats:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stats_follow_views(self, user_client, user, django_user_model):
+        author = django_user_model.objects.create_user(username='StatsAuthor')
+        Post.objects.create(text='Пост', author=author)
+        user_client.get(f'/{author.username}/follow')
+        author.stats.refresh_from_db()
+        user.stats.refresh_from_db()
+        assert (author.stats.followers_count, author.stats.posts_count) == (1, 1), \
+            'Проверьте, что подписка и новый пост обновляют счётчики автора'
+        assert user.stats.following_count == 1
+
+        user_client.get(f'/{author.username}/unfollow')
+        Post.objects.filter(author=author).delete()
+        author.stats.refresh_from_db()
+        user.stats.refresh_from_db()
+        assert (author.stats.followers_count, author.stats.posts_count) == (0, 0)
+        assert user.stats.following_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reconcile_user_stats(self, user, post):
+        user.stats.delete()
+        call_command('reconcile_counters')
+        user.refresh_from_db()
+        assert user.stats.posts_count == 1, \
+            'Проверьте, что reconcile_counters пересчитывает счётчики профиля'
@@ -0,0 +1,62 @@
+import pytest
+from django.core.paginator import Paginator, Page
+from django.utils import timezone
+
+from posts.models import Post
+from posts.services.paginator import CursorPaginator, CursorPage, MAX_NUMBERED_PAGES
+
+
+def create_posts(user, count):
+    posts = [Post.objects.create(text=f'Пост {i}', author=user) for i in range(count)]
+    # половина постов с одинаковой датой - проверяем разбор по id
+    Post.objects.filter(pk__in=[p.pk for p in posts[::2]]).update(pub_date=timezone.now())
+    return Post.objects.order_by('-pub_date', '-id')
+
+
+class TestCursorPaginator:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_cover_feed_once(self, user):
+        queryset = create_posts(user, 23)
+        paginator = CursorPaginator(queryset, 5)
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        assert seen == list(queryset.values_list('pk', flat=True)), \
+            'Проверьте, что курсорные страницы проходят ленту без пропусков и повторов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_newer_page(self, user):
+        queryset = create_posts(user, 12)
+        paginator = CursorPaginator(queryset, 5)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor, 'newer')
+        assert [p.pk for p in back] == [p.pk for p in first], \
+            'Проверьте, что ссылка "Предыдущая" возвращает на прошлую страницу'
+        assert not back.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_broken_cursor(self, user):
+        queryset = create_posts(user, 3)
+        page = CursorPaginator(queryset, 5).get_page('не-курсор')
+        assert len(page) == 3 and not page.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_deep_pages_switch_to_cursor(self, client, user):
+        create_posts(user, 10 * MAX_NUMBERED_PAGES + 3)
+        response = client.get(f'/?page={MAX_NUMBERED_PAGES + 5}')
+        paginator = response.context['paginator']
+        page = response.context['page']
+        assert type(paginator) == Paginator and type(page) == Page
+        assert page.number == MAX_NUMBERED_PAGES, \
+            'Проверьте, что номерные страницы ограничены глубиной PAGINATOR_MAX_NUMBERED_PAGES'
+        assert page.next_cursor
+
+        response = client.get(f'/?cursor={page.next_cursor}')
+        assert type(response.context['page']) == CursorPage
+        assert len(response.context['page']) == 3
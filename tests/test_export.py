@@ -0,0 +1,140 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import warnings
+
+import django
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import path, reverse
+
+from posts import async_views
+from posts.models import Comment, Post
+from posts.services import export
+
+# под ASGI выгрузку отдаёт асинхронная версия страницы
+urlpatterns = [
+    path('<username>/export/', async_views.export_posts, name='export_posts'),
+]
+
+
+@pytest.fixture
+def history(user, group):
+    posts = [
+        Post.objects.create(text=f'Пост {i}', author=user, group=group if i % 2 else None)
+        for i in range(5)
+    ]
+    comments = [
+        Comment.objects.create(post=posts[i], author=user, text=f'Комментарий "{i}",\nс переносом')
+        for i in range(3)
+    ]
+    return posts, comments
+
+
+def content(response):
+    assert response.streaming, 'Проверьте, что выгрузка отдаётся потоком'
+    return b''.join(response.streaming_content)
+
+
+class TestExport:
+
+    @pytest.mark.django_db
+    def test_ndjson(self, user_client, user, history, settings):
+        settings.EXPORT_CHUNK_SIZE = 2
+        url = reverse('export_posts', args=[user.username])
+        response = user_client.get(url)
+        assert 'attachment' in response['Content-Disposition']
+        records = [json.loads(line) for line in content(response).decode().splitlines()]
+        posts, comments = history
+        assert [(r['type'], r['id']) for r in records] == \
+            [('post', p.id) for p in posts] + [('comment', c.id) for c in comments], \
+            'Проверьте, что выгрузка содержит все посты, затем все комментарии автора'
+
+        compressed = content(user_client.get(url + '?gzip=1'))
+        assert gzip.decompress(compressed) == content(user_client.get(url)), \
+            'Проверьте, что ?gzip=1 сжимает ту же выгрузку'
+
+    @pytest.mark.django_db
+    def test_csv(self, user_client, user, history):
+        response = user_client.get(reverse('export_posts', args=[user.username]) + '?format=csv')
+        rows = list(csv.DictReader(io.StringIO(content(response).decode())))
+        assert len(rows) == 8 and rows[-1]['text'] == history[1][-1].text, \
+            'Проверьте, что CSV содержит строку на каждую запись и переживает кавычки и переносы'
+
+    @pytest.mark.django_db
+    def test_only_owner_or_staff(self, client, user_client, user, history, django_user_model):
+        other = django_user_model.objects.create_user(username='Other')
+        client.force_login(other)
+        url = reverse('export_posts', args=[user.username])
+        assert client.get(url).status_code == 403, \
+            'Проверьте, что чужую выгрузку получить нельзя'
+        other.is_staff = True
+        other.save()
+        assert client.get(url).status_code == 200, \
+            'Проверьте, что сотрудник может выгрузить записи любого автора'
+
+    @pytest.mark.skipif(django.VERSION < (4, 2), reason='асинхронный потоковый ответ - с Django 4.2')
+    @pytest.mark.urls(__name__)
+    @pytest.mark.django_db(transaction=True)
+    def test_asgi_stream(self, user, history, settings):
+        settings.EXPORT_CHUNK_SIZE = 2
+        client = AsyncClient()
+        client.force_login(user)
+
+        async def fetch():
+            response = await client.get(reverse('export_posts', args=[user.username]))
+            assert response.is_async, \
+                'Проверьте, что под ASGI выгрузка отдаётся асинхронным итератором'
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        with warnings.catch_warnings():
+            # синхронный итератор Django собрал бы в память целиком с предупреждением
+            warnings.simplefilter('error')
+            content = asyncio.run(fetch())
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        assert [r['id'] for r in records if r['type'] == 'post'] == [p.id for p in history[0]], \
+            'Проверьте, что под ASGI выгружаются все записи по порядку'
+
+    @pytest.mark.skipif(django.VERSION >= (4, 2), reason='до Django 4.2 выгрузку под ASGI отдаёт WSGI')
+    @pytest.mark.django_db(transaction=True)
+    def test_asgi_through_wsgi(self, client, user, history):
+        from yatube.asgi import application
+        client.force_login(user)
+        cookie = '{}={}'.format(
+            settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value)
+        scope = {
+            'type': 'http', 'method': 'GET', 'http_version': '1.1', 'query_string': b'',
+            'path': reverse('export_posts', args=[user.username]),
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(application(scope, receive, send))
+        assert messages[0]['status'] == 200
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        assert [r['id'] for r in records if r['type'] == 'post'] == [p.id for p in history[0]], \
+            'Проверьте, что под ASGI на Django < 4.2 выгрузку отдаёт WSGI-версия страницы'
+
+    def test_encoder_chunks(self):
+        encoder = export.Encoder(size=30)
+        chunks = encoder.feed({'id': i} for i in range(5)) + encoder.close()
+        assert [len(chunk) for chunk in chunks] == [30, 20]
+
+    @pytest.mark.django_db
+    def test_command(self, user, history, tmp_path):
+        path = tmp_path / 'export.csv.gz'
+        call_command('export_user', user.username, '--format', 'csv', '--gzip', '-o', str(path))
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(path.read_bytes()).decode())))
+        assert [row['type'] for row in rows].count('post') == 5, \
+            'Проверьте, что команда export_user пишет выгрузку в файл'
@@ -0,0 +1,53 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.base import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from posts.models import Post
+from posts.services import images
+
+ORIENTATION = 0x0112
+
+
+def get_photo(size, orientation=None):
+    image = Image.new('RGB', size, color='blue')
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    file_obj = BytesIO()
+    image.save(file_obj, 'JPEG', exif=exif)
+    file_obj.seek(0)
+    return File(file_obj, name='photo.jpeg')
+
+
+class TestImageIngest:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_large_photo_downscaled_without_exif(self, user_client, settings):
+        settings.IMAGE_MAX_SIZE = 800
+        user_client.post('/new/', data={'text': 'Большое фото', 'image': get_photo((3000, 2000), 6)})
+        post = Post.objects.get(text='Большое фото')
+        with post.image.open() as f:
+            image = Image.open(f)
+            assert image.height == 800 and image.width < 540, \
+                'Проверьте, что большая картинка уменьшается и поворачивается по EXIF'
+            assert not image.getexif(), 'Проверьте, что EXIF удаляется из загруженной картинки'
+        assert post.image.name.endswith('.jpg')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pixel_cap(self, user_client, settings):
+        settings.IMAGE_MAX_PIXELS = 1000 * 1000
+        response = user_client.post('/new/', data={'text': 'Слишком большое', 'image': get_photo((1200, 1000))})
+        assert response.status_code == 200 and response.context['form'].errors.get('image'), \
+            'Проверьте, что картинка больше IMAGE_MAX_PIXELS отклоняется с ошибкой формы'
+        assert not Post.objects.filter(text='Слишком большое').exists()
+
+    def test_process_pool(self, settings):
+        settings.IMAGE_INGEST_WORKERS = 1
+        upload = SimpleUploadedFile('pool.png', get_photo((100, 50)).read())
+        content, name = images.ingest(upload)
+        assert name == 'pool.jpg' and Image.open(BytesIO(content)).size == (100, 50), \
+            'Проверьте, что обработка работает в пуле процессов'
@@ -0,0 +1,116 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Job
+from posts.services import jobs
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('не получилось')
+
+
+@pytest.fixture(autouse=True)
+def queued(settings):
+    # здесь задачи выполняет воркер, а не процесс запроса
+    settings.JOBS_RUN_INLINE = False
+    calls.clear()
+
+
+class TestJobs:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_priority_order(self):
+        jobs.enqueue('tests.record', value='обычная')
+        jobs.enqueue('tests.record', value='срочная', priority=10)
+        jobs.enqueue('tests.record', value='отложенная', priority=20, delay=60)
+        assert jobs.work(until_empty=True) == 2
+        assert calls == ['срочная', 'обычная'], \
+            'Проверьте, что задачи выполняются по приоритету, а отложенные ждут своего времени'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_idempotency_key(self):
+        first = jobs.enqueue('tests.record', key='one', value=1)
+        second = jobs.enqueue('tests.record', key='one', value=2)
+        assert first.pk == second.pk, \
+            'Проверьте, что задача с тем же ключом не ставится повторно, пока ждёт'
+        jobs.work(until_empty=True)
+        assert jobs.enqueue('tests.record', key='one', value=3).pk != first.pk, \
+            'Проверьте, что после выполнения ключ снова свободен'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_key_requeued_while_running(self):
+        first = jobs.enqueue('tests.record', key='one', value=1)
+        assert jobs.claim(first.pk, 'worker')
+        second = jobs.enqueue('tests.record', key='one', value=2)
+        assert second.pk != first.pk, \
+            'Проверьте, что изменение во время выполнения задачи ставит следующую задачу'
+        assert jobs.enqueue('tests.record', key='one', value=3).pk == second.pk
+
+        Job.objects.filter(pk=first.pk).update(locked_at=timezone.now() - timezone.timedelta(hours=1))
+        assert jobs.requeue_stale() == 0
+        assert Job.objects.get(pk=first.pk).status == Job.FAILED, \
+            'Проверьте, что брошенная задача не дублирует ждущую с тем же ключом'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_retry_with_backoff(self):
+        job = jobs.enqueue('tests.fail')
+        jobs.work(until_empty=True)
+        job.refresh_from_db()
+        assert job.status == Job.QUEUED and job.attempts == 1 and job.run_at > timezone.now(), \
+            'Проверьте, что упавшая задача откладывается для повтора'
+        assert 'не получилось' in job.last_error
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.work(until_empty=True)
+        job.refresh_from_db()
+        assert job.status == Job.FAILED and job.attempts == 2, \
+            'Проверьте, что после max_attempts попыток задача помечается ошибкой'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stale_job_requeued(self):
+        job = jobs.enqueue('tests.record', value='брошенная')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_at=timezone.now() - timezone.timedelta(hours=1))
+        call_command('run_workers', '--once')
+        assert calls == ['брошенная'], \
+            'Проверьте, что задачи упавшего воркера возвращаются в очередь'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stale_job_requeued_by_running_worker(self, settings):
+        settings.JOBS_STALE_CHECK_INTERVAL = 0
+        job = jobs.enqueue('tests.record', value='брошенная', delay=60)
+        steps = []
+
+        def stop():
+            # воркер уже работает, когда другой бросает задачу
+            steps.append(None)
+            if len(steps) == 2:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.RUNNING, run_at=timezone.now(),
+                    locked_at=timezone.now() - timezone.timedelta(hours=1))
+            return bool(calls) or len(steps) > 5
+
+        jobs.work(stop, poll=0)
+        assert calls == ['брошенная'], \
+            'Проверьте, что запущенный воркер периодически возвращает брошенные задачи в очередь'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_password_reset_mail_queued(self, client, user, mailoutbox):
+        user.email = 'reader@example.com'
+        user.save()
+        client.post(reverse('password_reset'), {'email': user.email})
+        assert not mailoutbox and Job.objects.filter(name='mail.send', status=Job.QUEUED).exists(), \
+            'Проверьте, что письмо для сброса пароля ставится в очередь, а не отправляется из запроса'
+        jobs.work(until_empty=True)
+        assert [message.to for message in mailoutbox] == [[user.email]], \
+            'Проверьте, что воркер отправляет письмо из очереди'
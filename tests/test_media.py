@@ -0,0 +1,83 @@
+import os
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from posts.models import ImageVariant, Job, MediaBlob, Post
+from posts.services import media
+
+
+def image_bytes(color='green'):
+    file_obj = BytesIO()
+    Image.new('RGB', (400, 300), color=color).save(file_obj, 'JPEG')
+    return file_obj.getvalue()
+
+
+class TestContentAddressedMedia:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_same_upload_shared(self, user_client):
+        for text in ('Первый репост', 'Второй репост'):
+            user_client.post('/new/', data={'text': text, 'image': File(BytesIO(image_bytes()), name=f'{text}.jpg')})
+        first, second = Post.objects.filter(text__endswith='репост').order_by('id')
+        assert first.image.name == second.image.name, \
+            'Проверьте, что одинаковые картинки хранятся одним файлом'
+        assert MediaBlob.objects.get(name=first.image.name).refcount == 2
+        variants = list(ImageVariant.objects.filter(source=first.image.name))
+        assert variants, 'Проверьте, что превью общие для одинаковых картинок'
+
+        storage = media.get_storage()
+        first.delete()
+        assert storage.exists(second.image.name), \
+            'Проверьте, что файл не удаляется, пока на него ссылается другой пост'
+        second.delete()
+        assert not storage.exists(second.image.name), \
+            'Проверьте, что файл удаляется вместе с последним постом'
+        assert not ImageVariant.objects.filter(source=second.image.name).exists()
+        assert not default_storage.exists(variants[0].name)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_dedupe_legacy_files(self, user):
+        storage = media.get_storage()
+        legacy = []
+        for name in ('posts/one.jpg', 'posts/two.jpg'):
+            # старые файлы лежали под своими именами
+            default_storage.save(name, ContentFile(image_bytes('red')))
+            post = Post.objects.create(text=name, author=user)
+            Post.objects.filter(pk=post.pk).update(image=name)
+            legacy.append(post)
+        default_storage.save('posts/orphan.jpg', ContentFile(image_bytes('white')))
+
+        call_command('dedupe_media', '--delete-orphans')
+        names = set(Post.objects.filter(pk__in=[p.pk for p in legacy]).values_list('image', flat=True))
+        assert len(names) == 1, 'Проверьте, что команда объединяет одинаковые файлы'
+        name = names.pop()
+        assert storage.exists(name) and MediaBlob.objects.get(name=name).refcount == 2
+        for old in ('posts/one.jpg', 'posts/two.jpg', 'posts/orphan.jpg'):
+            assert not storage.exists(old), f'Проверьте, что команда удаляет старый файл {old}'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reused_file_not_collected(self, settings):
+        settings.MEDIA_COLLECT_GRACE = 60
+        settings.JOBS_RUN_INLINE = False
+        storage = media.get_storage()
+        name = storage.save('posts/photo.jpg', ContentFile(image_bytes('blue')))
+        hour_ago = time.time() - 3600
+        os.utime(storage.path(name), (hour_ago, hour_ago))
+        # та же картинка загружается снова, пост с ней ещё не закоммичен
+        assert storage.save('posts/again.jpg', ContentFile(image_bytes('blue'))) == name
+        media.collect(name)
+        assert storage.exists(name), \
+            'Проверьте, что только что загруженный заново файл не удаляется'
+        assert Job.objects.filter(name='media.collect', status=Job.QUEUED).exists(), \
+            'Проверьте, что удаление файла откладывается на MEDIA_COLLECT_GRACE'
+
+        os.utime(storage.path(name), (hour_ago, hour_ago))
+        media.collect(name)
+        assert not storage.exists(name) and not os.listdir(os.path.dirname(storage.path(name))), \
+            'Проверьте, что файл без ссылок удаляется после MEDIA_COLLECT_GRACE'
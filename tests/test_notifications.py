@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.core import mail
+
+from posts.models import Follow, Job, Post, UserStats
+from posts.services import jobs, notifications
+
+
+@pytest.fixture
+def followers(user, django_user_model):
+    readers = []
+    for i in range(5):
+        reader = django_user_model.objects.create_user(
+            username=f'Reader{i}', email=f'reader{i}@example.com' if i else '')
+        Follow.objects.create(user=reader, author=user)
+        readers.append(reader)
+    return readers
+
+
+class TestNotifications:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_coalesced_by_window(self, user, followers, settings):
+        settings.JOBS_RUN_INLINE = False
+        settings.NOTIFY_BATCH_SIZE = 2
+        for i in range(3):
+            Post.objects.create(text=f'Пост для подписчиков {i}', author=user)
+        assert Job.objects.filter(name='notifications.new_posts').count() == 1, \
+            'Проверьте, что посты автора в одном окне собираются в одну задачу'
+
+        job = Job.objects.get(name='notifications.new_posts')
+        Job.objects.filter(pk=job.pk).update(run_at=job.created)
+        jobs.work(until_empty=True)
+
+        assert Job.objects.filter(name='notifications.send_batch', status=Job.DONE).count() == 3, \
+            'Проверьте, что подписчики обходятся пачками по NOTIFY_BATCH_SIZE'
+        # у первого читателя нет почты - ему только счётчик
+        assert len(mail.outbox) == 4, 'Проверьте, что каждый подписчик с почтой получил одно письмо'
+        assert '(3)' in mail.outbox[0].subject and 'Пост для подписчиков 2' in mail.outbox[0].body
+        assert set(UserStats.objects.filter(
+            user__in=followers).values_list('unread_posts', flat=True)) == {3}, \
+            'Проверьте, что счётчик непрочитанных вырос у всех подписчиков'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counter_shown_and_reset(self, client, user, followers):
+        Post.objects.create(text='Свежий пост', author=user)
+        reader = followers[1]
+        client.force_login(reader)
+        assert 'badge' in client.get('/').content.decode(), \
+            'Проверьте, что в шапке виден счётчик непрочитанных'
+        client.get('/follow/')
+        assert UserStats.objects.get(user=reader).unread_posts == 0, \
+            'Проверьте, что страница подписок сбрасывает счётчик'
+        assert 'badge' not in client.get('/').content.decode()
+
+    def test_window(self):
+        start, end = notifications.get_window(datetime(2026, 1, 1, 12, 7, tzinfo=timezone.utc))
+        assert end - start == 300 and start % 300 == 0
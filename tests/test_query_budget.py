@@ -0,0 +1,74 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+# Сколько запросов к базе может сделать страница, включая сессию и пользователя.
+# Число не должно зависеть от количества постов и комментариев на странице.
+QUERY_BUDGET = {
+    'index': 4,
+    'group_posts': 5,
+    # плюс запрос валидатора условного GET (posts.services.freshness)
+    'profile': 7,
+    'post': 6,
+    # плюс сброс счётчика непрочитанных, если он не нулевой
+    'follow_index': 6,
+}
+
+
+@pytest.fixture
+def feed(user, django_user_model):
+    author = django_user_model.objects.create_user(username='BudgetAuthor')
+    group = Group.objects.create(title='Бюджет', slug='budget', description='Группа')
+    Follow.objects.create(user=user, author=author)
+    post = Post.objects.create(text='Первый пост', author=author, group=group)
+    return author, group, post
+
+
+def fill(author, group, post, count):
+    for i in range(count):
+        commenter = type(author).objects.create_user(username=f'Commenter{i}')
+        Post.objects.create(text=f'Пост {i}', author=commenter, group=group)
+        Post.objects.create(text=f'Пост автора {i}', author=author, group=group)
+        Comment.objects.create(post=post, author=commenter, text=f'Комментарий {i}')
+
+
+def urls(author, group, post):
+    return {
+        'index': reverse('index'),
+        'group_posts': reverse('group_posts', kwargs={'slug': group.slug}),
+        'profile': reverse('profile', kwargs={'username': author.username}),
+        'post': reverse('post', kwargs={'username': author.username, 'post_id': post.id}),
+        'follow_index': reverse('follow_index'),
+    }
+
+
+def count_queries(client, url):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_query_count_does_not_grow_with_page(self, user_client, feed):
+        author, group, post = feed
+        small = {name: count_queries(user_client, url) for name, url in urls(*feed).items()}
+        fill(author, group, post, 12)
+        full = {name: count_queries(user_client, url) for name, url in urls(*feed).items()}
+        assert small == full, \
+            'Проверьте, что число запросов страницы не зависит от количества постов на ней'
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('name', sorted(QUERY_BUDGET))
+    def test_query_budget(self, user_client, feed, name):
+        fill(*feed, 12)
+        queries = count_queries(user_client, urls(*feed)[name])
+        assert queries <= QUERY_BUDGET[name], \
+            f'Страница `{name}` делает {queries} запросов, бюджет - {QUERY_BUDGET[name]}'
@@ -0,0 +1,92 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.services.paginator import encode_cursor
+
+# таблицы лент: запросы к ним должны идти по индексу и без сортировки
+FEED_TABLES = ('posts_post', 'posts_comment', 'posts_follow', 'posts_timelineentry')
+CURSOR_PAGES = ('index', 'group_posts', 'profile', 'follow_index')
+PAGES = ('post', 'post_comments') + CURSOR_PAGES + tuple(name + '_cursor' for name in CURSOR_PAGES)
+
+
+@pytest.fixture
+def feed(user, django_user_model):
+    author = django_user_model.objects.create_user(username='PlanAuthor')
+    group = Group.objects.create(title='Планы', slug='plans', description='Группа')
+    Follow.objects.create(user=user, author=author)
+    posts = [
+        Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        for i in range(3)
+    ]
+    for i in range(3):
+        Comment.objects.create(post=posts[0], author=user, text=f'Комментарий {i}')
+    return author, group, posts
+
+
+def feed_urls(author, group, posts):
+    cursor = '?cursor=' + encode_cursor(posts[-1])
+    pages = {
+        'index': reverse('index'),
+        'group_posts': reverse('group_posts', kwargs={'slug': group.slug}),
+        'profile': reverse('profile', kwargs={'username': author.username}),
+        'post': reverse('post', kwargs={'username': author.username, 'post_id': posts[0].id}),
+        'follow_index': reverse('follow_index'),
+    }
+    # глубокие страницы листаются курсором - у них свой запрос
+    pages.update({
+        name + '_cursor': pages[name] + cursor
+        for name in CURSOR_PAGES
+    })
+    comment = Comment.objects.filter(post=posts[0]).order_by('created', 'id').last()
+    pages['post_comments'] = reverse(
+        'post_comments', kwargs={'username': author.username, 'post_id': posts[0].id},
+    ) + '?cursor=' + encode_cursor(comment, ('created', 'id'))
+    return pages
+
+
+def explain(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql):
+    problems = []
+    for detail in explain(sql):
+        if 'TEMP B-TREE' in detail:
+            problems.append(detail)
+        elif detail.startswith('SCAN') and 'INDEX' not in detail and any(
+                detail.split()[1] == table for table in FEED_TABLES):
+            problems.append(detail)
+    return problems
+
+
+class TestQueryPlans:
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('name', PAGES)
+    def test_feed_queries_use_indexes(self, user_client, feed, name):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(feed_urls(*feed)[name])
+        assert response.status_code == 200
+
+        problems = {}
+        for query in context.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and any(table in sql for table in FEED_TABLES):
+                found = plan_problems(sql)
+                if found:
+                    problems[sql] = found
+        assert not problems, \
+            f'Страница `{name}` читает ленту без индекса или с сортировкой: {problems}'
+
+    @pytest.mark.django_db
+    def test_detects_sort_without_index(self):
+        query = Post.objects.filter(group_id=1).order_by('-text').query
+        assert any('TEMP B-TREE' in detail for detail in explain(*query.sql_with_params())), \
+            'Проверьте, что тест планов замечает сортировку без индекса'
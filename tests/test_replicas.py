@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.functional import SimpleLazyObject
+
+from posts.models import Post
+from posts.routers import PrimaryReplicaRouter
+from posts.services import replicas
+
+
+@replicas.read_only
+def used_database(request):
+    return HttpResponse(Post.objects.all().db)
+
+
+def get(path='/', **cookies):
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    request.COOKIES.update(cookies)
+    return request
+
+
+@pytest.fixture
+def fresh_replica(monkeypatch):
+    monkeypatch.setattr(replicas, 'lag', lambda alias: 0)
+
+
+class TestReplicaRouting:
+
+    def test_reads_outside_pages_go_to_primary(self):
+        router = PrimaryReplicaRouter()
+        assert Post.objects.all().db == 'default', \
+            'Проверьте, что вне страниц read_only чтения идут в основную базу'
+        with replicas.reading('replica'):
+            assert Post.objects.all().db == 'replica', \
+                'Проверьте, что внутри reading() чтения идут в реплику'
+            assert router.db_for_write(Post) == 'default', \
+                'Проверьте, что запись всегда идёт в основную базу'
+        assert not router.allow_migrate('replica', 'posts'), \
+            'Проверьте, что миграции не применяются к реплике'
+
+    def test_read_only_page_uses_fresh_replica(self, fresh_replica):
+        assert used_database(get()).content == b'replica', \
+            'Проверьте, что страница read_only читает из свежей реплики'
+
+    def test_lagging_replica_falls_back_to_primary(self, settings, monkeypatch):
+        monkeypatch.setattr(
+            replicas, 'lag', lambda alias: settings.DATABASE_REPLICA_MAX_LAG + 1)
+        assert used_database(get()).content == b'default', \
+            'Проверьте, что отставшая реплика пропускается'
+        monkeypatch.setattr(replicas, 'lag', lambda alias: None)
+        assert used_database(get()).content == b'default', \
+            'Проверьте, что несозданная реплика пропускается'
+
+    def test_user_and_session_read_from_primary(self, fresh_replica):
+        used = []
+        request = get()
+        request.user = SimpleLazyObject(lambda: used.append(replicas.current()) or AnonymousUser())
+        assert used_database(request).content == b'replica'
+        assert used == [None], \
+            'Проверьте, что пользователь запроса загружается из основной базы, а не из реплики'
+        with replicas.reading('replica'):
+            assert Session.objects.all().db == 'default', \
+                'Проверьте, что сессии всегда читаются из основной базы'
+
+    def test_pinned_user_reads_primary(self, settings, fresh_replica):
+        request = get(**{settings.DATABASE_PIN_COOKIE: '1'})
+        assert used_database(request).content == b'default', \
+            'Проверьте, что после записи пользователь читает из основной базы'
+
+    @pytest.mark.django_db
+    def test_write_sets_pin_cookie(self, settings, user_client, post):
+        response = user_client.get('/')
+        assert settings.DATABASE_PIN_COOKIE not in response.cookies, \
+            'Проверьте, что чтение не закрепляет пользователя за основной базой'
+        response = user_client.post(
+            f'/{post.author.username}/{post.id}/comment/', {'text': 'Комментарий'})
+        cookie = response.cookies.get(settings.DATABASE_PIN_COOKIE)
+        assert cookie and cookie['max-age'] == settings.DATABASE_PIN_SECONDS, \
+            'Проверьте, что после записи ставится cookie закрепления'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_refresh_copies_primary(self, monkeypatch, tmp_path, post):
+        path = str(tmp_path / 'replica.sqlite3')
+        monkeypatch.setattr(replicas, 'get_path', lambda alias: path)
+        assert replicas.lag('replica') is None
+
+        started = time.time()
+        replicas.refresh('replica')
+        copy = sqlite3.connect(path)
+        texts = [row[0] for row in copy.execute('SELECT text FROM posts_post')]
+        copy.close()
+        assert texts == [post.text], 'Проверьте, что реплика - копия основной базы'
+        assert replicas.is_fresh('replica'), 'Проверьте, что обновлённая реплика свежая'
+        assert replicas.refreshed_at('replica') == pytest.approx(started, abs=0.01), \
+            'Проверьте, что свежесть реплики считается от начала копирования'
+
+        os.utime(path, (time.time() - 3600,) * 2)
+        assert not replicas.is_fresh('replica'), \
+            'Проверьте, что давно не обновлявшаяся реплика считается отставшей'
@@ -0,0 +1,64 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from posts.models import Post
+from posts.services import search
+
+
+def indexed_ids(word):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s', [word])
+        return {row[0] for row in cursor.fetchall()}
+
+
+class TestSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_follows_posts(self, user):
+        post = Post.objects.create(text='Первый снегопад в городе', author=user)
+        assert indexed_ids('снегопад') == {post.id}, \
+            'Проверьте, что новый пост попадает в поисковый индекс'
+        post.text = 'Весенняя капель'
+        post.save()
+        assert indexed_ids('снегопад') == set() and indexed_ids('капель') == {post.id}, \
+            'Проверьте, что изменённый текст поста переиндексируется'
+        post.delete()
+        assert indexed_ids('капель') == set()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_view(self, client, user):
+        Post.objects.create(text='Кот <b>спит</b> на диване', author=user)
+        Post.objects.create(text='Кот кот кот: кот видит кота', author=user)
+        Post.objects.create(text='Собака гуляет', author=user)
+        response = client.get('/search/', {'q': 'кот'})
+        posts = response.context['posts']
+        assert [p.text for p in posts] == ['Кот кот кот: кот видит кота', 'Кот <b>спит</b> на диване'], \
+            'Проверьте, что результаты поиска ранжируются по BM25'
+        content = response.content.decode()
+        assert '<mark>Кот</mark> &lt;b&gt;спит&lt;/b&gt;' in content, \
+            'Проверьте, что в сниппете подсвечены слова запроса, а текст поста экранирован'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_cursor(self, user):
+        for i in range(7):
+            Post.objects.create(text=f'Заметка номер {i}', author=user)
+        seen = []
+        posts, cursor = search.search_posts('заметка', limit=3)
+        seen += posts
+        while cursor:
+            posts, cursor = search.search_posts('заметка', cursor, limit=3)
+            seen += posts
+        assert sorted(p.id for p in seen) == sorted(Post.objects.values_list('id', flat=True))
+        assert len(seen) == 7
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_command(self, user):
+        post = Post.objects.create(text='Потерянный пост', author=user)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('delete-all')")
+        assert indexed_ids('потерянный') == set()
+        call_command('rebuild_search_index', batch_size=1)
+        assert indexed_ids('потерянный') == {post.id}, \
+            'Проверьте, что rebuild_search_index восстанавливает индекс'
@@ -0,0 +1,56 @@
+import importlib
+
+import pytest
+from django.db import connections
+
+from yatube import settings_production
+
+
+@pytest.fixture
+def file_connection(tmp_path):
+    # тестовая база в памяти, WAL проверяем на отдельном файле
+    settings_dict = dict(connections['default'].settings_dict, NAME=str(tmp_path / 'tuning.sqlite3'))
+    wrapper = connections['default'].__class__(settings_dict, alias='tuning')
+    yield wrapper
+    wrapper.close()
+
+
+def pragma(wrapper, name):
+    with wrapper.cursor() as cursor:
+        cursor.execute('PRAGMA {}'.format(name))
+        return cursor.fetchone()[0]
+
+
+class TestSqliteTuning:
+
+    @pytest.mark.django_db
+    def test_pragmas_applied_on_connect(self, settings, file_connection):
+        settings.SQLITE_PRAGMAS = settings_production.SQLITE_PRAGMAS
+        assert pragma(file_connection, 'journal_mode') == 'wal', \
+            'Проверьте, что новое соединение переводит базу в режим WAL'
+        assert pragma(file_connection, 'synchronous') == 1, \
+            'Проверьте, что на соединении выставляется synchronous=NORMAL'
+        assert pragma(file_connection, 'busy_timeout') == 5000, \
+            'Проверьте, что на соединении выставляется busy_timeout'
+        assert pragma(file_connection, 'cache_size') == -64 * 1024, \
+            'Проверьте, что на соединении выставляется cache_size'
+
+    @pytest.mark.django_db
+    def test_no_pragmas_by_default(self, file_connection):
+        assert pragma(file_connection, 'journal_mode') == 'delete', \
+            'Проверьте, что без SQLITE_PRAGMAS соединение не меняет журнал базы'
+
+    def test_production_profile(self, monkeypatch):
+        monkeypatch.delenv('YATUBE_PERSISTENT_CONNECTIONS', raising=False)
+        production = importlib.reload(settings_production)
+        assert not production.DEBUG, 'Проверьте, что в продакшен-профиле DEBUG выключен'
+        assert 'debug_toolbar' not in production.INSTALLED_APPS and not any(
+            'debug_toolbar' in middleware for middleware in production.MIDDLEWARE), \
+            'Проверьте, что в продакшен-профиле нет debug_toolbar'
+        assert production.DATABASES['default']['CONN_MAX_AGE'] == 0, \
+            'Проверьте, что под ASGI соединения с базой не держатся между запросами'
+
+        monkeypatch.setenv('YATUBE_PERSISTENT_CONNECTIONS', '1')
+        production = importlib.reload(settings_production)
+        assert production.DATABASES['default']['CONN_MAX_AGE'] > 0, \
+            'Проверьте, что под WSGI соединения с базой переиспользуются'
@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+
+from posts.lru import MISSING
+from posts.models import ImageVariant, Post
+from posts.services import thumbnails
+
+
+def get_image_file(name, size=(1600, 900)):
+    file_obj = BytesIO()
+    Image.new('RGB', size, color='red').save(file_obj, 'JPEG')
+    file_obj.seek(0)
+    return File(file_obj, name=name)
+
+
+class TestThumbnails:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generated_after_new_post(self, user_client, user):
+        user_client.post('/new/', data={'text': 'Пост с картинкой', 'image': get_image_file('photo.jpg')})
+        post = Post.objects.get(text='Пост с картинкой')
+        variants = ImageVariant.objects.filter(source=post.image.name)
+        expected = len(thumbnails.WIDTHS) * len(thumbnails.get_formats())
+        assert variants.count() == expected, \
+            'Проверьте, что после сохранения поста картинка нарезается на все размеры и форматы'
+        for variant in variants:
+            assert variant.width * 3 == variant.height * 4
+            with default_storage.open(variant.name) as f:
+                assert Image.open(f).size == (variant.width, variant.height)
+
+        content = user_client.get('/').content.decode()
+        assert 'srcset=' in content and '320w' in content, \
+            'Проверьте, что лента выводит srcset из готовых превью'
+        if 'webp' in thumbnails.get_formats():
+            assert 'type="image/webp"' in content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_original_until_generated(self, client, user):
+        name = default_storage.save('posts/raw.jpg', get_image_file('raw.jpg'))
+        Post.objects.create(text='Ещё без превью', author=user, image=name)
+        content = client.get('/').content.decode()
+        assert default_storage.url(name) in content and 'srcset=' not in content, \
+            'Проверьте, что до нарезки превью показывается исходная картинка'
+
+        thumbnails.process(name)
+        assert 'srcset=' in client.get('/').content.decode(), \
+            'Проверьте, что после нарезки страница перестаёт отдаваться из кэша со старой картинкой'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_partial_set_not_cached(self, user):
+        name = default_storage.save('posts/partial.jpg', get_image_file('partial.jpg'))
+        post = Post.objects.create(text='Нарезка ещё идёт', author=user, image=name)
+        ImageVariant.objects.create(
+            source=name, width=320, height=240, format='jpeg', name='thumbs/partial_320w.jpg')
+        thumbnails.attach(post)
+        assert thumbnails.variants_cache.get(name) is MISSING, \
+            'Проверьте, что неполный набор превью не запоминается в памяти процесса'
+
+        ImageVariant.objects.filter(source=name).delete()
+        thumbnails.generate(name)
+        thumbnails.attach(post)
+        assert len(thumbnails.variants_cache.get(name)) == len(thumbnails.expected_variants()), \
+            'Проверьте, что полный набор превью запоминается'
@@ -0,0 +1,82 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from posts.models import Follow, Job, Post, TimelineEntry
+from posts.services import jobs
+
+
+class TestTimeline:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_on_new_post(self, user):
+        author = get_user_model().objects.create_user(username='TimelineAuthor')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Пост для подписчиков', author=author)
+        assert TimelineEntry.objects.filter(user=user, post=post).exists(), \
+            'Проверьте, что новый пост попадает в ленту подписчиков'
+        assert TimelineEntry.objects.filter(user=author).count() == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backfill_and_trim(self, user_client, user):
+        author = get_user_model().objects.create_user(username='TimelineAuthor')
+        for i in range(3):
+            Post.objects.create(text=f'Старый пост {i}', author=author)
+
+        user_client.get(f'/{author.username}/follow')
+        assert TimelineEntry.objects.filter(user=user).count() == 3, \
+            'Проверьте, что при подписке в ленту добавляются последние посты автора'
+        response = user_client.get('/follow/')
+        assert [p.text for p in response.context['page']] == \
+            ['Старый пост 2', 'Старый пост 1', 'Старый пост 0']
+
+        user_client.get(f'/{author.username}/unfollow')
+        assert TimelineEntry.objects.filter(user=user).count() == 0, \
+            'Проверьте, что при отписке посты автора убираются из ленты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_heavy_author_merged_on_read(self, settings, user_client, user):
+        settings.TIMELINE_FANOUT_MAX_FOLLOWERS = 2
+        heavy = get_user_model().objects.create_user(username='HeavyAuthor')
+        light = get_user_model().objects.create_user(username='LightAuthor')
+        other = get_user_model().objects.create_user(username='OtherReader')
+        Follow.objects.create(user=user, author=heavy)
+        Follow.objects.create(user=other, author=heavy)
+        Follow.objects.create(user=user, author=light)
+        cache.clear()
+
+        for i in range(4):
+            Post.objects.create(text=f'Популярный {i}', author=heavy)
+            Post.objects.create(text=f'Обычный {i}', author=light)
+        assert not TimelineEntry.objects.filter(author=heavy).exists(), \
+            'Проверьте, что посты популярных авторов не раскладываются по лентам'
+        assert TimelineEntry.objects.filter(author=light).count() == 4
+
+        response = user_client.get('/follow/')
+        texts = [p.text for p in response.context['page']]
+        assert texts == [f'{kind} {i}' for i in range(3, -1, -1) for kind in ('Обычный', 'Популярный')], \
+            'Проверьте, что посты популярных авторов подмешиваются в ленту при чтении'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_demoted_author_backfilled_by_job(self, settings, user):
+        settings.TIMELINE_FANOUT_MAX_FOLLOWERS = 2
+        heavy = get_user_model().objects.create_user(username='HeavyAuthor')
+        other = get_user_model().objects.create_user(username='OtherReader')
+        Follow.objects.create(user=user, author=heavy)
+        Follow.objects.create(user=other, author=heavy)
+        for i in range(3):
+            Post.objects.create(text=f'Популярный {i}', author=heavy)
+        TimelineEntry.objects.filter(author=heavy).delete()
+
+        settings.JOBS_RUN_INLINE = False
+        Follow.objects.get(user=other, author=heavy).delete()
+        job = Job.objects.get(name='timeline.demote')
+        assert job.run_at > timezone.now(), \
+            'Проверьте, что дозаполнение лент ждёт, пока истечёт кэш популярных авторов'
+        jobs.work(until_empty=True)
+        assert TimelineEntry.objects.filter(author=heavy).count() == 0
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.work(until_empty=True)
+        assert TimelineEntry.objects.filter(user=user, author=heavy).count() == 3, \
+            'Проверьте, что автор, переставший быть популярным, дозаполняет ленты подписчиков'
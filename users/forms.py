@@ -1,5 +1,8 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
+from django.template import loader
+
+from posts.services import jobs
 
 User = get_user_model()
 
@@ -12,3 +15,22 @@ class CreationForm(UserCreationForm):
         model = User
         # укажем, какие поля должны быть видны в форме и в каком порядке
         fields = ("first_name", "last_name", "username", "email")
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """
+    Письмо со ссылкой для сброса пароля отправляет воркер очереди задач,
+    а не процесс запроса. Письмо рендерится здесь: в контексте есть
+    объекты, которые не сериализуются в аргументы задачи.
+    """
+
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+        html_message = None
+        if html_email_template_name is not None:
+            html_message = loader.render_to_string(html_email_template_name, context)
+        jobs.enqueue(
+            'mail.send', subject=subject,
+            message=loader.render_to_string(email_template_name, context),
+            recipient_list=[to_email], from_email=from_email, html_message=html_message)
@@ -1,6 +1,11 @@
 from . import views
+from .forms import QueuedPasswordResetForm
+from django.contrib.auth.views import PasswordResetView
 from django.urls import path
 
 urlpatterns = [
-     path('signup/', views.SignUp.as_view(), name="signup")
+     path('signup/', views.SignUp.as_view(), name="signup"),
+     # раньше django.contrib.auth.urls: письмо уходит через очередь задач
+     path('password_reset/', PasswordResetView.as_view(form_class=QueuedPasswordResetForm),
+          name="password_reset"),
 ]
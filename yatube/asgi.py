@@ -9,8 +9,48 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
+import django
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
 from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.urls import Resolver404, resolve
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# страницы лент - асинхронные версии из posts.async_views
+os.environ.setdefault('YATUBE_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+
+class WsgiExports:
+    """
+    Django до 4.2 перебирает потоковый ответ синхронно прямо в цикле
+    событий, и каждый запрос выгрузки к базе останавливал бы все
+    остальные запросы воркера. Выгрузку отдаёт WSGI-версия страницы:
+    WsgiToAsgi перебирает ответ в отдельном потоке и передаёт куски
+    в цикл событий.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.exports = WsgiToAsgi(get_wsgi_application())
+
+    def is_export(self, scope):
+        if scope['type'] != 'http':
+            return False
+        try:
+            return resolve(scope['path']).url_name == 'export_posts'
+        except Resolver404:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if not self.is_export(scope):
+            return await self.application(scope, receive, send)
+        # свой поток на каждую выгрузку, а не общий для всех
+        async with ThreadSensitiveContext():
+            return await self.exports(scope, receive, send)
+
+
+if django.VERSION < (4, 2):
+    application = WsgiExports(application)
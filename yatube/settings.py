@@ -61,6 +61,9 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    # до сессий и CSRF: попадание в кэш не трогает базу
+    'posts.middleware.AnonymousPageCacheMiddleware',
+    'posts.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,12 +103,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # копия основной базы, её обновляет manage.py refresh_replicas
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Ленты, профили и поиск читают из реплик (posts.services.replicas).
+# Реплика, обновлённая больше DATABASE_REPLICA_MAX_LAG секунд назад (или
+# ещё не созданная), пропускается. После записи пользователь читает из
+# основной базы DATABASE_PIN_SECONDS секунд - не меньше допустимого
+# отставания, чтобы он сразу видел свои изменения
+DATABASE_ROUTERS = ['posts.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICA_MAX_LAG = 30
+DATABASE_REPLICA_REFRESH_INTERVAL = 10
+DATABASE_PIN_SECONDS = DATABASE_REPLICA_MAX_LAG
+DATABASE_PIN_COOKIE = 'pin_primary'
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
+# первый бэкенд загружает вместе с пользователем его UserStats,
+# ModelBackend остаётся для сессий, созданных до его появления
+AUTHENTICATION_BACKENDS = [
+    'users.backends.ModelBackendWithStats',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -124,7 +154,7 @@ AUTH_PASSWORD_VALIDATORS = [
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
 }
 
 # Internationalization
@@ -158,3 +188,85 @@ LOGOUT_REDIRECT_URL = "index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+DEFAULT_FROM_EMAIL = 'noreply@yatube.local'
+
+# Глубже этого номера страницы ленты листаются курсором (pub_date, id)
+PAGINATOR_MAX_NUMBERED_PAGES = 10
+
+# JSON API лент (posts/api.py): постов на странице по умолчанию и максимум
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Выгрузка постов и комментариев автора: строк из базы за раз
+# и размер куска потокового ответа, байты
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# Комментарии на странице поста подгружаются порциями по (created, id)
+COMMENTS_PAGE_SIZE = 50
+
+# Лента подписок: сколько постов автора добавлять при подписке
+# и какими пачками раскладывать новый пост по подписчикам
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Посты авторов, у которых подписчиков больше порога, не раскладываются
+# по лентам, а подмешиваются в /follow/ при чтении
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000
+TIMELINE_HEAVY_AUTHORS_TTL = 600
+
+# Фрагмент ленты на главной сбрасывается версией ленты, а не по времени.
+# Версия лежит в кэше default, поэтому при нескольких воркерах он должен
+# быть общим (см. settings_production)
+INDEX_PAGE_CACHE_TIMEOUT = 60 * 60 * 3
+
+# Полностраничный кэш для анонимных читателей, сбрасывается по суррогатным
+# ключам. С LocMemCache сброс виден только своему процессу - при нескольких
+# воркерах нужен общий кэш (memcached, redis)
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Превью картинок постов режутся один раз после сохранения поста
+# фоновой задачей (см. JOBS_*)
+THUMBNAIL_WIDTHS = (320, 640, 1024)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_VARIANTS_LRU_SIZE = 10000
+
+# Загруженные картинки проверяются по заголовку и пережимаются в пуле
+# процессов: не больше IMAGE_MAX_SIZE по большей стороне, без EXIF.
+# 0 воркеров - обработка в процессе запроса
+IMAGE_INGEST_WORKERS = 2
+IMAGE_INGEST_TIMEOUT = 30
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_SIZE = 2560
+IMAGE_QUALITY = 88
+# Файл без ссылок удаляется, только если его не загружали заново
+# последние MEDIA_COLLECT_GRACE секунд: пост с ним мог ещё не закоммититься
+MEDIA_COLLECT_GRACE = 60
+
+# Асинхронные страницы лент включаются в yatube/asgi.py. Запросы к базе
+# и рендеринг выполняются в пуле из ASYNC_POOL_WORKERS потоков - это
+# и верхняя граница числа соединений с базой на процесс
+ASYNC_FEED_VIEWS = os.environ.get('YATUBE_ASYNC_VIEWS') == '1'
+ASYNC_POOL_WORKERS = 16
+
+# Очередь фоновых задач в таблице posts_job, воркеры - manage.py run_workers.
+# JOBS_RUN_INLINE выполняет задачи в процессе запроса после коммита
+JOBS_RUN_INLINE = False
+JOBS_WORKERS = 2
+JOBS_POLL_INTERVAL = 1.0
+# задержка повтора удваивается с каждой попыткой, секунды
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+# задача, захваченная раньше, считается брошенной упавшим воркером
+JOBS_STALE_TIMEOUT = 60 * 10
+JOBS_STALE_CHECK_INTERVAL = 60
+JOBS_KEEP_DAYS = 7
+
+# Уведомления подписчикам: посты автора за окно NOTIFY_WINDOW секунд
+# уходят одним письмом, подписчики обходятся пачками по NOTIFY_BATCH_SIZE
+NOTIFY_WINDOW = 5 * 60
+NOTIFY_GRACE = 5
+NOTIFY_BATCH_SIZE = 500
+
+# PRAGMA, которые выполняются на каждом новом соединении с SQLite
+# (см. yatube/settings_production.py)
+SQLITE_PRAGMAS = {}
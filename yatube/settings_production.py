@@ -0,0 +1,57 @@
+"""
+Настройки для продакшена поверх yatube.settings:
+
+    DJANGO_SETTINGS_MODULE=yatube.settings_production uvicorn yatube.asgi:application
+"""
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)  # noqa: F405
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '*').split(',')
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']  # noqa: F405
+MIDDLEWARE = [  # noqa: F405
+    middleware for middleware in MIDDLEWARE  # noqa: F405
+    if middleware != 'debug_toolbar.middleware.DebugToolbarMiddleware'
+]
+
+# под WSGI (yatube/wsgi.py ставит YATUBE_PERSISTENT_CONNECTIONS=1)
+# соединение живёт между запросами: без повторного открытия файла и
+# настройки PRAGMA на каждый запрос. Под ASGI синхронный код запроса
+# выполняется в потоках asgiref, где постоянные соединения не
+# переиспользуются и не закрываются (Django #33497), поэтому там
+# CONN_MAX_AGE = 0. Копия, чтобы не менять словарь базовых настроек
+WSGI_CONN_MAX_AGE = 60 * 10
+PERSISTENT_CONNECTIONS = os.environ.get('YATUBE_PERSISTENT_CONNECTIONS') == '1'
+DATABASES = copy.deepcopy(DATABASES)  # noqa: F405
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = WSGI_CONN_MAX_AGE if PERSISTENT_CONNECTIONS else 0
+
+# WAL: читатели не блокируют писателя и наоборот. synchronous=NORMAL
+# в режиме WAL не портит базу при падении процесса, теряются только
+# последние транзакции при отключении питания. Кэш страниц и mmap - на
+# соединение; писатели ждут блокировку до busy_timeout мс вместо
+# немедленного "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# кэш default общий для всех воркеров: версия ленты, поколения страниц
+# и версия автодополнения должны меняться сразу во всех процессах, а с
+# LocMemCache сброс виден только своему. memcached выбран за атомарные
+# incr и add, на которых держатся эти счётчики
+CACHES = copy.deepcopy(CACHES)  # noqa: F405
+CACHES['default'] = {
+    'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
+}
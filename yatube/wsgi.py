@@ -12,5 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# потоки WSGI-сервера живут между запросами - соединения с базой тоже
+# (CONN_MAX_AGE в yatube.settings_production)
+os.environ.setdefault('YATUBE_PERSISTENT_CONNECTIONS', '1')
 
 application = get_wsgi_application()